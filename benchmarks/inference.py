@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Forest inference benchmark: per-row latency of the native engine vs scikit-learn
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from demo import create_demo_data
+from src.voice_emotion import VoiceEmotionAnalyzer
+from src.forest_engine import NativeForest, NativeScaler
+
+def time_per_row(predict, X, batch_size, repeats):
+    """Median seconds per row when scoring X in batches of batch_size"""
+    batches = [X[i:i + batch_size] for i in range(0, len(X) - batch_size + 1, batch_size)]
+    per_row = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for batch in batches:
+            predict(batch)
+        per_row.append((time.perf_counter() - start) / (len(batches) * batch_size))
+    return statistics.median(per_row)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare native and scikit-learn forest inference")
+    parser.add_argument('--model', help='Pickled model to benchmark (default: train one on demo data)')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 64], help='Rows per predict call')
+    parser.add_argument('--rows', type=int, default=512, help='Rows scored per repeat')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed repeats per batch size')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+    
+    analyzer = VoiceEmotionAnalyzer(args.model, backend='sklearn')
+    if args.model is None:
+        features, labels = create_demo_data()
+        analyzer.train_model(features, labels)
+    
+    model = analyzer.model
+    native_model = NativeForest.from_sklearn(model)
+    native_scaler = NativeScaler.from_sklearn(analyzer.scaler, model.n_features_in_)
+    
+    rng = np.random.default_rng(0)
+    raw = rng.standard_normal((args.rows, model.n_features_in_))
+    X = analyzer.scaler.transform(raw)
+    
+    # The native engine must reproduce scikit-learn exactly, not approximately
+    expected = model.predict_proba(X)
+    actual = native_model.predict_proba(native_scaler.transform(raw))
+    max_diff = float(np.abs(expected - actual).max())
+    identical = bool(np.array_equal(model.predict(X), native_model.predict(X)))
+    print(f"trees {len(model.estimators_)}  max depth {native_model.max_depth}  "
+          f"max |p_sklearn - p_native| {max_diff:.3g}  labels identical: {identical}")
+    
+    results = []
+    for batch_size in args.batch_sizes:
+        sklearn_s = time_per_row(model.predict_proba, X, batch_size, args.repeats)
+        native_s = time_per_row(native_model.predict_proba, X, batch_size, args.repeats)
+        results.append({
+            'batch_size': batch_size,
+            'sklearn_us_per_row': round(sklearn_s * 1e6, 2),
+            'native_us_per_row': round(native_s * 1e6, 2),
+            'speedup': round(sklearn_s / native_s, 2),
+        })
+        print(f"batch {batch_size:>4}  sklearn {sklearn_s * 1e6:9.1f} us/row  "
+              f"native {native_s * 1e6:9.1f} us/row  speedup {sklearn_s / native_s:5.1f}x")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'n_trees': len(model.estimators_),
+                'max_depth': native_model.max_depth,
+                'max_abs_diff': max_diff,
+                'labels_identical': identical,
+                'results': results,
+            }, f, indent=2)
+    
+    sys.exit(0 if max_diff == 0.0 and identical else 1)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
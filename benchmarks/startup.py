@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+CLI startup benchmark: import time and wall time of main.py commands
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Commands that must start without touching the heavy stack
+LIGHT_COMMANDS = [
+    ['--help'],
+    ['train', '--help'],
+    ['compare-models', '--help'],
+    ['add-trees', '--help'],
+    ['compact', '--help'],
+    ['extract', '--help'],
+    ['manifest', '--help'],
+    ['merge', '--help'],
+    ['predict', '--help'],
+    ['convert', '--help'],
+    ['timeline', '--help'],
+    ['realtime', '--help'],
+    ['multistream', '--help'],
+    ['serve', '--help'],
+]
+
+# Top-level packages that light commands must not import
+HEAVY_MODULES = {'numpy', 'scipy', 'librosa', 'sklearn', 'pandas', 'pyaudio', 'soundfile', 'numba'}
+
+def measure_imports(command):
+    """Run main.py under -X importtime; return total import time (ms) and top-level packages"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', 'main.py'] + command,
+        cwd=ROOT, capture_output=True, text=True
+    )
+    
+    total_us = 0
+    packages = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        total_us += int(fields[0])
+        packages.add(fields[2].strip().split('.')[0])
+    
+    return total_us / 1000, packages
+
+def measure_wall(command, repeats):
+    """Median wall-clock time (ms) of running main.py with the given arguments"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, 'main.py'] + command, cwd=ROOT, capture_output=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure main.py startup cost")
+    parser.add_argument('--budget-ms', type=float, default=150.0, help='Maximum import time per light command')
+    parser.add_argument('--repeats', type=int, default=5, help='Wall-clock runs per command')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+    
+    results = []
+    failed = False
+    
+    for command in LIGHT_COMMANDS:
+        import_ms, packages = measure_imports(command)
+        wall_ms = measure_wall(command, args.repeats)
+        heavy = sorted(packages & HEAVY_MODULES)
+        ok = import_ms <= args.budget_ms and not heavy
+        failed |= not ok
+        
+        results.append({
+            'command': ' '.join(command),
+            'import_ms': round(import_ms, 1),
+            'wall_ms': round(wall_ms, 1),
+            'heavy_imports': heavy,
+            'ok': ok,
+        })
+        status = 'OK' if ok else 'OVER BUDGET'
+        extra = f" heavy imports: {', '.join(heavy)}" if heavy else ''
+        print(f"{' '.join(command):<20} imports {import_ms:7.1f} ms  wall {wall_ms:7.1f} ms  {status}{extra}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'budget_ms': args.budget_ms, 'results': results}, f, indent=2)
+    
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: feature extraction, prediction, streaming, multi-stream ticks, dataset processing and model load
+
+Writes machine-readable results (throughput, p50/p99 latency, peak memory)
+to a JSON file; pass a previous results file with --compare to flag
+regressions between commits.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import soundfile as sf
+from create_test_audio import TEST_SOUNDS, synthesize_audio
+from demo import create_demo_data
+from src.voice_emotion import VoiceEmotionAnalyzer
+from src.data_processor import DataProcessor
+from src.real_time_detector import RealTimeEmotionDetector
+from src.audio_sources import GeneratorSource
+from src.multi_stream import MultiStreamDetector
+
+SAMPLE_RATE = 22050
+DURATIONS = [1, 3, 10, 30]
+SEED = 1234
+
+class Fixtures:
+    """Synthetic audio, a small labelled dataset and trained model files in a temp directory"""
+    
+    def __init__(self, root, dataset_files_per_emotion=6):
+        rng = np.random.RandomState(SEED)
+        emotions = list(TEST_SOUNDS)
+        
+        self.audio = {}
+        for duration in DURATIONS:
+            path = os.path.join(root, f'clip_{duration}s.wav')
+            sf.write(path, synthesize_audio(emotions[duration % len(emotions)], duration, SAMPLE_RATE, rng), SAMPLE_RATE)
+            self.audio[duration] = path
+        
+        # data_dir/<emotion>/*.wav, the layout DataProcessor.process_dataset expects
+        self.dataset_dir = os.path.join(root, 'dataset')
+        self.dataset_files = 0
+        for emotion in emotions:
+            os.makedirs(os.path.join(self.dataset_dir, emotion))
+            for i in range(dataset_files_per_emotion):
+                path = os.path.join(self.dataset_dir, emotion, f'{i}.wav')
+                sf.write(path, synthesize_audio(emotion, 3, SAMPLE_RATE, rng), SAMPLE_RATE)
+                self.dataset_files += 1
+        
+        analyzer = VoiceEmotionAnalyzer()
+        features, labels = create_demo_data()
+        analyzer.train_model(features, labels)
+        self.model_path = os.path.join(root, 'model.pkl')
+        self.compact_model_path = os.path.join(root, 'model.vem')
+        analyzer.save_model(self.model_path)
+        analyzer.save_model(self.compact_model_path)
+
+def measure(fn, repeats, warmup=1, setup=None):
+    """Run fn repeatedly; returns per-call seconds and peak traced memory of one call.
+    
+    ``setup`` (untimed) runs before every call. Memory is traced in a
+    separate call so tracemalloc's overhead does not distort the timings.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    
+    times = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    
+    if setup:
+        setup()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return times, peak
+
+def quiet(fn):
+    """Wrap fn so its progress output does not flood the benchmark log"""
+    def call():
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            return fn()
+    return call
+
+def summarize(name, params, times, peak_bytes, items_per_call=1, audio_seconds_per_call=None):
+    """One result record: latency percentiles, throughput and peak memory"""
+    times_ms = np.array(times) * 1000
+    median = statistics.median(times)
+    record = {
+        'name': name,
+        'params': params,
+        'repeats': len(times),
+        'p50_ms': round(float(np.percentile(times_ms, 50)), 3),
+        'p99_ms': round(float(np.percentile(times_ms, 99)), 3),
+        'mean_ms': round(float(times_ms.mean()), 3),
+        'throughput_per_s': round(items_per_call / median, 2),
+        'peak_memory_mb': round(peak_bytes / 2 ** 20, 2),
+    }
+    if audio_seconds_per_call is not None:
+        record['realtime_factor'] = round(audio_seconds_per_call / median, 1)
+    return record
+
+def bench_extract_features(fixtures, repeats):
+    analyzer = VoiceEmotionAnalyzer()
+    for duration, path in fixtures.audio.items():
+        times, peak = measure(lambda: analyzer.extract_features(path), repeats)
+        yield summarize('extract_features', {'duration_s': duration}, times, peak,
+                        audio_seconds_per_call=duration)
+
+def bench_predict_emotion(fixtures, repeats):
+    analyzer = VoiceEmotionAnalyzer(fixtures.model_path)
+    for duration, path in fixtures.audio.items():
+        times, peak = measure(lambda: analyzer.predict_emotion(path), repeats)
+        yield summarize('predict_emotion', {'duration_s': duration}, times, peak,
+                        audio_seconds_per_call=duration)
+
+def bench_process_audio_chunk(fixtures, repeats):
+    signal, _ = sf.read(fixtures.audio[30], dtype='float32')
+    
+    for incremental in (False, True):
+        detector = RealTimeEmotionDetector(
+            fixtures.model_path, sample_rate=SAMPLE_RATE, hop_seconds=0.5,
+            incremental_features=incremental, source=GeneratorSource([], sample_rate=SAMPLE_RATE)
+        )
+        hop = detector.hop_size
+        position = [0]
+        
+        def fill():
+            # Top the buffer up to one full window with the next samples of the clip
+            while len(detector.audio_buffer) < detector.window_size:
+                start = position[0] % (len(signal) - hop)
+                detector._write_samples(signal[start:start + hop])
+                position[0] += hop
+        
+        times, peak = measure(quiet(detector.process_audio_chunk), repeats, warmup=2, setup=fill)
+        yield summarize('process_audio_chunk', {'window_s': 2.0, 'hop_s': 0.5, 'incremental': incremental},
+                        times, peak, audio_seconds_per_call=0.5)
+
+def bench_multi_stream_tick(fixtures, repeats):
+    signal, _ = sf.read(fixtures.audio[30], dtype='float32')
+    
+    for n_streams in (1, 16, 64):
+        detector = MultiStreamDetector(fixtures.model_path, sample_rate=SAMPLE_RATE, hop_seconds=0.5,
+                                       queue_size=1, on_result=lambda name, segment: None)
+        for i in range(n_streams):
+            detector.add_stream(i)
+        hop = detector.hop_size
+        position = [0]
+        
+        def fill():
+            # One new hop per stream, so every stream has exactly one window ready
+            for i in range(n_streams):
+                start = (position[0] + i * hop) % (len(signal) - hop)
+                detector.feed(i, signal[start:start + hop])
+            position[0] += hop
+        
+        for _ in range(4):
+            fill()
+        times, peak = measure(detector.tick, repeats, warmup=2, setup=fill)
+        yield summarize('multi_stream_tick', {'streams': n_streams, 'window_s': 2.0, 'hop_s': 0.5},
+                        times, peak, items_per_call=n_streams, audio_seconds_per_call=0.5 * n_streams)
+
+def bench_process_dataset(fixtures, repeats):
+    processor = DataProcessor()
+    for n_workers in sorted({1, os.cpu_count() or 1}):
+        times, peak = measure(
+            quiet(lambda: processor.process_dataset(fixtures.dataset_dir, n_workers=n_workers)),
+            max(1, repeats // 10), warmup=0
+        )
+        yield summarize('process_dataset', {'files': fixtures.dataset_files, 'n_workers': n_workers},
+                        times, peak, items_per_call=fixtures.dataset_files)
+
+def bench_model_load(fixtures, repeats):
+    for label, path in (('pickle', fixtures.model_path), ('compact', fixtures.compact_model_path)):
+        times, peak = measure(lambda: VoiceEmotionAnalyzer(path), repeats)
+        record = summarize('model_load', {'format': label}, times, peak)
+        record['file_bytes'] = os.path.getsize(path)
+        yield record
+
+BENCHMARKS = {
+    'extract_features': bench_extract_features,
+    'predict_emotion': bench_predict_emotion,
+    'process_audio_chunk': bench_process_audio_chunk,
+    'multi_stream_tick': bench_multi_stream_tick,
+    'process_dataset': bench_process_dataset,
+    'model_load': bench_model_load,
+}
+
+def environment():
+    """Commit, interpreter and library versions the results were produced with"""
+    import librosa
+    import sklearn
+    
+    def git(*args):
+        result = subprocess.run(['git'] + list(args), cwd=ROOT, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else None
+    
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'librosa': librosa.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+def result_key(record):
+    return record['name'] + json.dumps(record['params'], sort_keys=True)
+
+def compare(results, baseline_path, tolerance, min_delta_ms):
+    """Print p50 ratios against a baseline results file; returns the regressed keys"""
+    with open(baseline_path) as f:
+        baseline = {result_key(r): r for r in json.load(f)['results']}
+    
+    regressions = []
+    print(f"\nComparison with {baseline_path} (p50, tolerance {tolerance:.0%}):")
+    for record in results:
+        key = result_key(record)
+        if key not in baseline:
+            continue
+        ratio = record['p50_ms'] / baseline[key]['p50_ms']
+        delta_ms = record['p50_ms'] - baseline[key]['p50_ms']
+        regressed = ratio > 1 + tolerance and delta_ms > min_delta_ms
+        if regressed:
+            regressions.append(key)
+        print(f"  {key:<70} {baseline[key]['p50_ms']:9.2f} -> {record['p50_ms']:9.2f} ms  "
+              f"x{ratio:5.2f}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the performance benchmark suite")
+    parser.add_argument('--output', default='benchmark_results.json', help='Results JSON path')
+    parser.add_argument('--repeats', type=int, default=30, help='Timed calls per benchmark')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help='Run a subset of benchmarks')
+    parser.add_argument('--compare', help='Baseline results JSON; exit non-zero on p50 regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p50 slowdown before flagging (0.2 = 20%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='Ignore slowdowns smaller than this, which are timer noise for sub-millisecond benchmarks')
+    args = parser.parse_args()
+    
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        print("Generating fixtures...")
+        fixtures = quiet(lambda: Fixtures(root))()
+        
+        for name in args.only or BENCHMARKS:
+            for record in BENCHMARKS[name](fixtures, args.repeats):
+                results.append(record)
+                params = ' '.join(f'{k}={v}' for k, v in record['params'].items())
+                print(f"{name:<20} {params:<45} p50 {record['p50_ms']:9.2f} ms  p99 {record['p99_ms']:9.2f} ms  "
+                      f"{record['throughput_per_s']:9.2f}/s  peak {record['peak_memory_mb']:7.2f} MB")
+    
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'repeats': args.repeats, 'results': results}, f, indent=2)
+    print(f"\nResults written to: {args.output}")
+    
+    if args.compare:
+        sys.exit(1 if compare(results, args.compare, args.tolerance, args.min_delta_ms) else 0)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
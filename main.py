@@ -5,83 +5,730 @@ Voice Emotion Recognition - Main Application
 
 import argparse
 import os
-from src.voice_emotion import VoiceEmotionAnalyzer
-from src.data_processor import DataProcessor
-from src.real_time_detector import RealTimeEmotionDetector
+import sys
 
-def train_model(data_dir, model_output):
-    """Train emotion recognition model"""
-    print("Training emotion recognition model...")
+# Heavy dependencies (numpy, librosa, scikit-learn, PyAudio) are imported
+# inside each command so that `--help` and light commands start quickly and
+# commands that do not need PyAudio work on hosts without it. See
+# benchmarks/startup.py for the import-time budget.
+
+# Mirrors src.forest_engine.BACKENDS, kept here so argument parsing does not import numpy
+BACKENDS = ['auto', 'sklearn', 'native']
+BACKEND_HELP = 'Inference engine: native tree arrays, scikit-learn, or auto (native for .vem models)'
+
+# Mirrors src.audio_io.RESAMPLE_QUALITIES
+RESAMPLE_QUALITIES = ['best', 'high', 'medium', 'fast']
+RESAMPLE_HELP = 'Resampler tier for files not already at 22050 Hz (high matches librosa.load)'
+
+# Keys of src.model_types.MODEL_TYPES
+MODEL_TYPES = ['random_forest', 'extra_trees', 'hist_gradient_boosting', 'logistic_regression', 'mlp']
+# ...and those with native set: the ones .vem files and the native backend support
+NATIVE_MODEL_TYPES = ['random_forest', 'extra_trees']
+
+# Keys of src.data_processor.DEFAULT_EMOTIONS_MAPPING
+EMOTIONS = ['neutral', 'happy', 'sad', 'angry', 'fear', 'disgust', 'surprise']
+
+def add_vad_arguments(parser, flag, help):
+    """Voice activity gate options: an on/off flag plus its thresholds"""
+    parser.add_argument(flag, dest='vad', action='store_true', help=help)
+    parser.add_argument('--vad-threshold-db', type=float, default=-40.0,
+                        help='Frames below this RMS level (dBFS) are never speech')
+    parser.add_argument('--vad-hangover', type=float, default=0.3,
+                        help='Seconds of audio kept after (and, when trimming, before) detected speech')
+
+def make_vad(args):
+    """VoiceActivityGate for the parsed options, or None when the gate is off"""
+    if not getattr(args, 'vad', False):
+        return None
+    from src.vad import VoiceActivityGate
+    return VoiceActivityGate(energy_threshold_db=args.vad_threshold_db, hangover_seconds=args.vad_hangover)
+
+def print_training_report(report):
+    """Print fit time and held-out accuracy from VoiceEmotionAnalyzer.training_report"""
+    model = f"{report['n_trees']} trees" if report['n_trees'] is not None else report['model_type']
+    print(f"Fitted {report['n_train']} samples in {report['fit_seconds']:.2f} s ({model})")
+    if report['holdout_accuracy'] is None:
+        return
+    if 'holdout_accuracy_before' in report:
+        print(f"Held-out accuracy ({report['n_holdout']} new samples): "
+              f"{report['holdout_accuracy_before']:.3f} before, {report['holdout_accuracy']:.3f} after")
+    else:
+        print(f"Held-out accuracy ({report['n_holdout']} samples): {report['holdout_accuracy']:.3f}")
+    if report['refit']:
+        print(f"(scored on a fit without the held-out samples; the saved model uses all {report['n_train']})")
+
+def make_processor(cache_dir=None, cache_size_mb=512, resample_quality='high', audio_cache_dir=None,
+                   audio_cache_size_mb=2048, vad=None):
+    """DataProcessor configured from the shared extraction options"""
+    from src.data_processor import DataProcessor
+    
+    return DataProcessor(
+        cache_dir=cache_dir,
+        cache_max_bytes=cache_size_mb * 1024 * 1024,
+        resample_quality=resample_quality,
+        audio_cache_dir=audio_cache_dir,
+        audio_cache_max_bytes=audio_cache_size_mb * 1024 * 1024,
+        vad=vad
+    )
+
+def extract_to_store(data_dir, store_dir, n_workers=None, shard_rows=4096, **processor_options):
+    """Extract a dataset into a sharded feature store, skipping files it already holds"""
+    from src.feature_store import FeatureStore
     
-    # Process dataset
-    processor = DataProcessor()
-    features, labels = processor.process_dataset(data_dir)
+    processor = make_processor(**processor_options)
+    with FeatureStore(store_dir, shard_rows=shard_rows) as store:
+        appended = processor.build_store(data_dir, store, n_workers=n_workers)
+        print(f"Appended {appended} rows to {store_dir} ({len(store)} rows in {store.n_shards} shards)")
+
+def write_manifest_command(data_dir, manifest_path):
+    """Scan data_dir/<emotion>/ once into a manifest for sharded extraction"""
+    from src.manifest import write_manifest
+    from src.data_processor import scan_dataset
+    
+    files = scan_dataset(data_dir)
+    write_manifest(files, data_dir, manifest_path)
+    print(f"Wrote {len(files)} files to manifest: {manifest_path}")
+
+def extract_manifest_shard(manifest_path, shard, parts_dir, n_workers=None, data_root=None, shard_rows=4096,
+                           **processor_options):
+    """Extract one k/N shard of a manifest into its part store under parts_dir"""
+    from src.manifest import parse_shard
     
+    try:
+        shard_index, num_shards = parse_shard(shard)
+    except ValueError as e:
+        print(e)
+        return
+    
+    processor = make_processor(**processor_options)
+    marker = processor.process_manifest_shard(manifest_path, shard_index, num_shards, parts_dir,
+                                              n_workers=n_workers, data_root=data_root, shard_rows=shard_rows)
+    print(f"Shard {shard_index}/{num_shards} done: {marker['rows']} of {marker['files']} files extracted")
+
+def merge_parts_command(parts_dir, store_dir, allow_partial=False):
+    """Combine completed part stores into one feature store"""
+    from src.manifest import merge_parts
+    
+    try:
+        summary = merge_parts(parts_dir, store_dir, allow_partial=allow_partial)
+    except ValueError as e:
+        print(f"Cannot merge: {e}")
+        return
+    print(f"Merged {summary['parts']} of {summary['num_shards']} parts into {store_dir}: "
+          f"{summary['appended']} rows appended, {summary['rows']} total, {summary['failed']} files failed extraction")
+
+def load_store_subset(store_dir, emotions=None, per_label=None, fraction=None):
+    """Features and labels for a filtered, optionally stratified subset of a feature store"""
+    from src.feature_store import FeatureStore
+    from src.data_processor import DEFAULT_EMOTIONS_MAPPING
+    
+    labels = [DEFAULT_EMOTIONS_MAPPING[emotion] for emotion in emotions] if emotions else None
+    with FeatureStore(store_dir) as store:
+        if per_label is None and fraction is None:
+            ids = store.select(labels=labels)
+        else:
+            ids = store.stratified_ids(per_label=per_label, fraction=fraction, labels=labels)
+        print(f"Loading {len(ids)} of {len(store)} stored feature vectors")
+        return store.load(ids)
+
+def load_training_data(data_dir=None, store_dir=None, n_workers=None, cache_dir=None, cache_size_mb=512,
+                       resample_quality='high', audio_cache_dir=None, audio_cache_size_mb=2048, emotions=None,
+                       per_label=None, fraction=None, vad=None):
+    """Features and labels from a feature store or, extracting them, from a dataset directory"""
+    if store_dir:
+        return load_store_subset(store_dir, emotions, per_label, fraction)
+    processor = make_processor(cache_dir, cache_size_mb, resample_quality, audio_cache_dir, audio_cache_size_mb, vad)
+    return processor.process_dataset(data_dir, n_workers=n_workers)
+
+def train_model(data_dir, model_output, n_workers=None, cache_dir=None, cache_size_mb=512,
+                resample_quality='high', audio_cache_dir=None, audio_cache_size_mb=2048, n_jobs=-1, holdout=0.2,
+                store_dir=None, emotions=None, per_label=None, fraction=None, vad=None, model_type='random_forest'):
+    """Train emotion recognition model from a dataset directory or a feature store"""
+    from src.voice_emotion import VoiceEmotionAnalyzer
+    from src.model_format import COMPACT_MODEL_EXTENSION
+    
+    if model_output.endswith(COMPACT_MODEL_EXTENSION) and model_type not in NATIVE_MODEL_TYPES:
+        print(f"Only forests can be saved as {COMPACT_MODEL_EXTENSION}; use a .pkl output for {model_type}")
+        return
+    
+    print(f"Training emotion recognition model ({model_type})...")
+    
+    features, labels = load_training_data(data_dir, store_dir, n_workers, cache_dir, cache_size_mb, resample_quality,
+                                          audio_cache_dir, audio_cache_size_mb, emotions, per_label, fraction, vad)
     if len(features) == 0:
         print("No valid audio files found in dataset!")
         return
     
     # Train model
     analyzer = VoiceEmotionAnalyzer()
-    analyzer.train_model(features, labels)
+    analyzer.train_model(features, labels, n_jobs=n_jobs, holdout=holdout, model_type=model_type)
+    print_training_report(analyzer.training_report)
     
     # Save model
-    os.makedirs(os.path.dirname(model_output), exist_ok=True)
+    os.makedirs(os.path.dirname(model_output) or '.', exist_ok=True)
     analyzer.save_model(model_output)
     
     print(f"Model trained and saved to: {model_output}")
 
-def predict_emotion(audio_file, model_path):
-    """Predict emotion from audio file"""
+def compare_models_command(data_dir, store_dir, model_types=None, holdout=0.2, n_jobs=-1, batch_size=64,
+                           latency_budget_ms=None, max_size_kb=None, output_path=None, models_dir=None,
+                           n_workers=None, cache_dir=None, emotions=None, per_label=None, fraction=None):
+    """Train each model type on the same data and print accuracy against size, load time and latency"""
+    import json
+    from src.model_evaluation import compare_model_types, recommend
+    
+    features, labels = load_training_data(data_dir, store_dir, n_workers, cache_dir, emotions=emotions,
+                                          per_label=per_label, fraction=fraction)
+    if len(features) == 0:
+        print("No valid audio files found in dataset!")
+        return
+    
+    print(f"Comparing {len(model_types or MODEL_TYPES)} model types on {len(labels)} samples (holdout {holdout})...")
+    rows = compare_model_types(features, labels, model_types, holdout=holdout, n_jobs=n_jobs, batch_size=batch_size,
+                               models_dir=models_dir)
+    
+    max_size_bytes = max_size_kb * 1024 if max_size_kb is not None else None
+    best = recommend(rows, latency_budget_ms, max_size_bytes)
+    
+    print(f"{'model':<24}{'format':<7}{'accuracy':>9}{'size KB':>10}{'load ms':>9}"
+          f"{'1-row p50':>11}{'1-row p99':>11}{f'batch {batch_size}':>11}{'fit s':>8}")
+    for row in rows:
+        accuracy = f"{row['holdout_accuracy']:.3f}" if row['holdout_accuracy'] is not None else '-'
+        marker = '  <- best within budget' if row is best else ''
+        print(f"{row['model_type']:<24}{row['format']:<7}{accuracy:>9}{row['size_bytes'] / 1024:>10.1f}"
+              f"{row['load_ms']:>9.1f}{row['single_p50_ms']:>11.3f}{row['single_p99_ms']:>11.3f}"
+              f"{row['batch_ms']:>11.3f}{row['fit_seconds']:>8.2f}{marker}")
+    print("Latencies are milliseconds per predict call on ready feature vectors (extraction not included)")
+    
+    if (latency_budget_ms is not None or max_size_kb is not None) and best is None:
+        print("No model meets the budget")
+    
+    if output_path:
+        with open(output_path, 'w') as f:
+            json.dump({'rows': rows, 'latency_budget_ms': latency_budget_ms, 'max_size_kb': max_size_kb,
+                       'recommended': best}, f, indent=2)
+        print(f"Report written to: {output_path}")
+
+def compact_model_command(model_path, output_path, data_dir, store_dir, max_accuracy_drop=0.01, latency_budget_ms=None,
+                          max_size_kb=None, report_path=None, n_workers=None, cache_dir=None, emotions=None,
+                          per_label=None, fraction=None):
+    """Prune a saved forest's trees and depth to a latency or size budget and print before/after numbers"""
     if not os.path.exists(model_path):
         print(f"Model not found: {model_path}")
         return
     
-    analyzer = VoiceEmotionAnalyzer(model_path)
-    result = analyzer.predict_emotion(audio_file)
+    import json
+    from src.compaction import compact_model
+    
+    features, labels = load_training_data(data_dir, store_dir, n_workers, cache_dir, emotions=emotions,
+                                          per_label=per_label, fraction=fraction)
+    if len(features) == 0:
+        print("No valid audio files found in dataset!")
+        return
+    
+    print(f"Compacting {model_path} on {len(labels)} held-out samples (max accuracy drop {max_accuracy_drop})...")
+    max_size_bytes = max_size_kb * 1024 if max_size_kb is not None else None
+    try:
+        report = compact_model(model_path, output_path, features, labels, max_accuracy_drop, latency_budget_ms,
+                               max_size_bytes)
+    except ValueError as e:
+        print(f"Cannot compact: {e}")
+        return
+    
+    print(f"{'':<8}{'trees':>7}{'depth':>7}{'nodes':>9}{'accuracy':>10}{'size KB':>10}{'load ms':>9}"
+          f"{'1-row p50':>11}{'1-row p99':>11}{'batch 64':>10}")
+    # 'input' is the original pickle, if it was one; before/after are both .vem and differ only by pruning
+    for name in ('input', 'before', 'after'):
+        row = report[name]
+        if row is None:
+            continue
+        print(f"{name:<8}{row['n_trees']:>7}{row['max_depth']:>7}{row['n_nodes']:>9}{row['holdout_accuracy']:>10.3f}"
+              f"{row['size_bytes'] / 1024:>10.1f}{row['load_ms']:>9.2f}{row['single_p50_ms']:>11.3f}"
+              f"{row['single_p99_ms']:>11.3f}{row['batch_ms']:>10.3f}")
     
-    if result:
-        print(f"Audio file: {audio_file}")
-        print(f"Predicted emotion: {result['emotion']}")
-        print(f"Confidence: {result['confidence']:.2f}")
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to: {report_path}")
+    
+    if report['after'] is None:
+        print("No compaction meets the budget within the allowed accuracy drop; nothing written")
     else:
-        print("Failed to analyze audio file")
+        print(f"Compacted model saved to: {output_path}")
 
-def real_time_detection(model_path):
-    """Start real-time emotion detection"""
+def add_trees(model_path, data_dir, model_output=None, n_trees=50, n_workers=None, cache_dir=None, n_jobs=-1,
+              holdout=0.2, cache_size_mb=512, resample_quality='high', audio_cache_dir=None, audio_cache_size_mb=2048,
+              vad=None):
+    """Grow a saved forest with trees fitted on newly labelled data only"""
     if not os.path.exists(model_path):
         print(f"Model not found: {model_path}")
         return
     
-    detector = RealTimeEmotionDetector(model_path)
+    from src.voice_emotion import VoiceEmotionAnalyzer
+    
+    # Warm start needs the scikit-learn forest itself, not the native engine
+    try:
+        analyzer = VoiceEmotionAnalyzer(model_path, backend='sklearn')
+    except ValueError as e:
+        print(f"Cannot add trees to {model_path}: {e}")
+        return
+    
+    print(f"Adding {n_trees} trees to {model_path}...")
+    # Extract the new data the way the model's training data was extracted
+    processor = make_processor(cache_dir, cache_size_mb, resample_quality, audio_cache_dir, audio_cache_size_mb, vad)
+    features, labels = processor.process_dataset(data_dir, n_workers=n_workers)
+    
+    if len(features) == 0:
+        print("No valid audio files found in dataset!")
+        return
+    
+    try:
+        analyzer.add_trees(features, labels, n_trees=n_trees, n_jobs=n_jobs, holdout=holdout)
+    except ValueError as e:
+        print(f"Cannot add trees: {e}")
+        return
+    print_training_report(analyzer.training_report)
+    
+    model_output = model_output or model_path
+    analyzer.save_model(model_output)
+    print(f"Model saved to: {model_output}")
+
+def predict_emotion(audio_files, model_path, backend='auto', resample_quality='high', audio_cache_dir=None, vad=None):
+    """Predict emotion from one or more audio files"""
+    if not os.path.exists(model_path):
+        print(f"Model not found: {model_path}")
+        return
+    
+    from src.voice_emotion import VoiceEmotionAnalyzer
+    from src.audio_cache import DecodedAudioCache
+    
+    audio_cache = DecodedAudioCache(audio_cache_dir) if audio_cache_dir else None
+    analyzer = VoiceEmotionAnalyzer(model_path, backend=backend, resample_quality=resample_quality,
+                                    audio_cache=audio_cache, vad=vad)
+    results = analyzer.predict_emotions(audio_files)
+    
+    for audio_file, result in zip(audio_files, results):
+        if result:
+            print(f"Audio file: {audio_file}")
+            print(f"Predicted emotion: {result['emotion']}")
+            print(f"Confidence: {result['confidence']:.2f}")
+        else:
+            print(f"Failed to analyze audio file: {audio_file}")
+
+def emotion_timeline_command(audio_file, model_path, output_path=None, window_seconds=2.0, hop_seconds=1.0,
+                             incremental_features=False, backend='auto', resample_quality='high', vad=None):
+    """Write a per-segment emotion timeline for a long recording as JSON lines"""
+    if not os.path.exists(model_path):
+        print(f"Model not found: {model_path}")
+        return
+    
+    from src.voice_emotion import VoiceEmotionAnalyzer
+    from src.timeline import emotion_timeline, write_jsonl
+    from src.audio_sources import FileSource
+    
+    analyzer = VoiceEmotionAnalyzer(model_path, backend=backend)
+    segments = emotion_timeline(
+        analyzer, FileSource(audio_file, chunk_size=8192, resample_quality=resample_quality),
+        window_seconds=window_seconds,
+        hop_seconds=hop_seconds,
+        incremental_features=incremental_features,
+        vad=vad
+    )
+    
+    if output_path:
+        with open(output_path, 'w') as f:
+            count = write_jsonl(segments, f)
+        print(f"Wrote {count} segments to: {output_path}")
+    else:
+        write_jsonl(segments, sys.stdout)
+
+def real_time_detection(model_path, window_seconds=2.0, hop_seconds=1.0, overload_policy=None,
+                        incremental_features=False, source='mic', input_path=None, paced=False,
+                        pcm_dtype='int16', sample_rate=22050, backend='auto', resample_quality='high', vad=None):
+    """Start real-time emotion detection from the microphone, a file or stdin"""
+    if not os.path.exists(model_path):
+        print(f"Model not found: {model_path}")
+        return
+    
+    from src.real_time_detector import RealTimeEmotionDetector
+    from src.audio_sources import FileSource, PCMStreamSource
+    
+    if source == 'file':
+        if not input_path:
+            print("--input is required with --source file")
+            return
+        audio_source = FileSource(input_path, sample_rate=sample_rate, paced=paced, resample_quality=resample_quality)
+    elif source == 'stdin':
+        audio_source = PCMStreamSource(sample_rate=sample_rate, pcm_dtype=pcm_dtype, paced=paced)
+    else:
+        audio_source = None
+    
+    detector = RealTimeEmotionDetector(
+        model_path,
+        sample_rate=sample_rate,
+        window_seconds=window_seconds,
+        hop_seconds=hop_seconds,
+        overload_policy=overload_policy,
+        incremental_features=incremental_features,
+        source=audio_source,
+        backend=backend,
+        vad=vad
+    )
     detector.start_recording()
 
+def multi_stream_detection(model_path, input_paths, lines=None, output_path=None, window_seconds=2.0, hop_seconds=1.0,
+                           max_batch=64, queue_size=4, paced=False, sample_rate=22050, backend='auto',
+                           resample_quality='high', vad=None, overload_policy=None):
+    """Detect emotions on many concurrent streams with one model and batched inference"""
+    if not os.path.exists(model_path):
+        print(f"Model not found: {model_path}")
+        return
+    
+    from src.multi_stream import MultiStreamDetector
+    from src.timeline import write_jsonl
+    from src.audio_sources import FileSource
+    
+    # Replay the inputs round-robin as `lines` concurrent streams
+    lines = lines or len(input_paths)
+    sources = {}
+    for i in range(lines):
+        path = input_paths[i % len(input_paths)]
+        sources[f"line{i}:{os.path.basename(path)}"] = FileSource(
+            path, sample_rate=sample_rate, paced=paced, resample_quality=resample_quality
+        )
+    
+    output = open(output_path, 'w') if output_path else None
+    on_result = None
+    if output is not None:
+        def on_result(name, segment):
+            write_jsonl([dict(stream=name, **segment)], output)
+    
+    detector = MultiStreamDetector(
+        model_path,
+        sample_rate=sample_rate,
+        window_seconds=window_seconds,
+        hop_seconds=hop_seconds,
+        max_batch=max_batch,
+        queue_size=queue_size,
+        backend=backend,
+        vad=vad,
+        on_result=on_result,
+        overload_policy=overload_policy
+    )
+    try:
+        detector.run(sources)
+    finally:
+        if output is not None:
+            output.close()
+
+def serve(model_path, host='127.0.0.1', port=8000, max_batch=32, max_delay_ms=5.0, workers=None, backend='auto',
+          resample_quality='high', prediction_cache_size=0):
+    """Serve predictions over HTTP from one warm model"""
+    if not os.path.exists(model_path):
+        print(f"Model not found: {model_path}")
+        return
+    
+    from src.server import run_server
+    
+    run_server(
+        model_path,
+        host=host,
+        port=port,
+        max_batch=max_batch,
+        max_delay_ms=max_delay_ms,
+        workers=workers,
+        backend=backend,
+        resample_quality=resample_quality,
+        prediction_cache_size=prediction_cache_size
+    )
+
+def convert_model(model_path, output_path):
+    """Convert a pickled model to the compact memory-mappable format"""
+    if not os.path.exists(model_path):
+        print(f"Model not found: {model_path}")
+        return
+    
+    from src.model_format import convert_pickle_model
+    
+    try:
+        convert_pickle_model(model_path, output_path)
+    except ValueError as e:
+        print(f"Cannot convert: {e}")
+        return
+    print(f"Converted {model_path} -> {output_path} ({os.path.getsize(output_path)} bytes)")
+
 def main():
     parser = argparse.ArgumentParser(description="Voice Emotion Recognition")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='Record per-stage timings: *.jsonl logs every event, other paths get '
+                             'Prometheus text (rewritten every 10 s), "-" prints it to stderr on exit')
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
     
     # Train command
     train_parser = subparsers.add_parser('train', help='Train emotion recognition model')
-    train_parser.add_argument('--data', required=True, help='Path to training data directory')
+    train_source = train_parser.add_mutually_exclusive_group(required=True)
+    train_source.add_argument('--data', help='Path to training data directory')
+    train_source.add_argument('--store', help='Train from a feature store built with the extract command')
     train_parser.add_argument('--output', default='models/emotion_model.pkl', help='Output model path')
+    train_parser.add_argument('--workers', type=int, default=None, help='Feature extraction processes (default: all cores)')
+    train_parser.add_argument('--cache-dir', default=None, help='Feature cache directory; only new or changed files are re-extracted')
+    train_parser.add_argument('--cache-size-mb', type=int, default=512, help='Maximum feature cache size in MB')
+    train_parser.add_argument('--resample-quality', choices=RESAMPLE_QUALITIES, default='high', help=RESAMPLE_HELP)
+    train_parser.add_argument('--audio-cache-dir', default=None,
+                              help='Cache decoded, resampled audio here (speeds up re-extraction after feature changes)')
+    train_parser.add_argument('--audio-cache-size-mb', type=int, default=2048, help='Maximum decoded audio cache size in MB')
+    train_parser.add_argument('--jobs', type=int, default=-1, help='Cores used to fit trees (-1: all)')
+    train_parser.add_argument('--holdout', type=float, default=0.2,
+                              help='Fraction of samples held out to report accuracy; the saved model is then refitted on '
+                                   'all samples (0 skips the held-out fit)')
+    train_parser.add_argument('--model-type', choices=MODEL_TYPES, default='random_forest',
+                              help='Classifier to fit (only forests can be saved as .vem or use the native backend)')
+    add_vad_arguments(train_parser, '--trim-silence', 'Trim leading and trailing silence before feature extraction')
+    train_parser.add_argument('--emotions', nargs='+', choices=EMOTIONS, help='With --store: train on these emotions only')
+    train_parser.add_argument('--per-label', type=int, default=None, help='With --store: sample at most N rows per emotion')
+    train_parser.add_argument('--fraction', type=float, default=None,
+                              help='With --store: sample this fraction of each emotion')
+    
+    # Compare-models command
+    compare_parser = subparsers.add_parser('compare-models',
+                                           help='Report accuracy, size, load time and latency of each model type')
+    compare_source = compare_parser.add_mutually_exclusive_group(required=True)
+    compare_source.add_argument('--data', help='Path to training data directory')
+    compare_source.add_argument('--store', help='Feature store built with the extract command')
+    compare_parser.add_argument('--model-types', nargs='+', choices=MODEL_TYPES, default=None,
+                                help='Model types to compare (default: all)')
+    compare_parser.add_argument('--holdout', type=float, default=0.2, help='Fraction of samples held out for accuracy')
+    compare_parser.add_argument('--jobs', type=int, default=-1, help='Cores used to fit forests (-1: all)')
+    compare_parser.add_argument('--batch-size', type=int, default=64, help='Rows per call for the batch latency')
+    compare_parser.add_argument('--latency-budget-ms', type=float, default=None,
+                                help='Recommend the most accurate model whose single-row p99 latency fits this budget')
+    compare_parser.add_argument('--max-size-kb', type=float, default=None, help='Only recommend models up to this size')
+    compare_parser.add_argument('--output', help='Write the report as JSON here')
+    compare_parser.add_argument('--models-dir', help='Keep the trained models here (default: discard them)')
+    compare_parser.add_argument('--workers', type=int, default=None, help='Feature extraction processes (default: all cores)')
+    compare_parser.add_argument('--cache-dir', default=None, help='Feature cache directory')
+    compare_parser.add_argument('--emotions', nargs='+', choices=EMOTIONS, help='With --store: use these emotions only')
+    compare_parser.add_argument('--per-label', type=int, default=None, help='With --store: sample at most N rows per emotion')
+    compare_parser.add_argument('--fraction', type=float, default=None, help='With --store: sample this fraction of each emotion')
+    
+    # Extract command
+    extract_parser = subparsers.add_parser('extract', help='Extract a dataset into a sharded on-disk feature store')
+    extract_source = extract_parser.add_mutually_exclusive_group(required=True)
+    extract_source.add_argument('--data', help='Path to training data directory')
+    extract_source.add_argument('--manifest', help='Manifest written by the manifest command (use with --shard)')
+    extract_parser.add_argument('--store', required=True,
+                                help='Feature store directory (appended to if it exists); with --manifest, the parts directory')
+    extract_parser.add_argument('--shard', default='0/1', help='With --manifest: process shard k of N (k counts from 0)')
+    extract_parser.add_argument('--data-root', default=None,
+                                help='With --manifest: where the dataset is mounted on this node, if not where it was scanned')
+    extract_parser.add_argument('--shard-rows', type=int, default=4096, help='Feature vectors per shard file')
+    extract_parser.add_argument('--workers', type=int, default=None, help='Feature extraction processes (default: all cores)')
+    extract_parser.add_argument('--cache-dir', default=None, help='Feature cache directory')
+    extract_parser.add_argument('--resample-quality', choices=RESAMPLE_QUALITIES, default='high', help=RESAMPLE_HELP)
+    extract_parser.add_argument('--audio-cache-dir', default=None, help='Decoded audio cache directory')
+    add_vad_arguments(extract_parser, '--trim-silence', 'Trim leading and trailing silence before feature extraction')
+    
+    # Add-trees command
+    add_trees_parser = subparsers.add_parser('add-trees', help='Add trees fitted on newly labelled data to a saved model')
+    add_trees_parser.add_argument('--model', required=True, help='Pickled model to extend')
+    add_trees_parser.add_argument('--data', required=True, help='Directory of new training data (data/<emotion>/*.wav)')
+    add_trees_parser.add_argument('--output', help='Output model path (default: overwrite --model)')
+    add_trees_parser.add_argument('--trees', type=int, default=50, help='Number of trees to add')
+    add_trees_parser.add_argument('--workers', type=int, default=None, help='Feature extraction processes (default: all cores)')
+    add_trees_parser.add_argument('--cache-dir', default=None, help='Feature cache directory')
+    add_trees_parser.add_argument('--cache-size-mb', type=int, default=512, help='Maximum feature cache size in MB')
+    add_trees_parser.add_argument('--resample-quality', choices=RESAMPLE_QUALITIES, default='high', help=RESAMPLE_HELP)
+    add_trees_parser.add_argument('--audio-cache-dir', default=None,
+                                  help='Cache decoded, resampled audio here (speeds up re-extraction after feature changes)')
+    add_trees_parser.add_argument('--audio-cache-size-mb', type=int, default=2048,
+                                  help='Maximum decoded audio cache size in MB')
+    add_vad_arguments(add_trees_parser, '--trim-silence',
+                      'Trim leading and trailing silence before feature extraction (match the setting used to train --model)')
+    add_trees_parser.add_argument('--jobs', type=int, default=-1, help='Cores used to fit trees (-1: all)')
+    add_trees_parser.add_argument('--holdout', type=float, default=0.2,
+                                  help='Fraction of the new samples held out to report accuracy before and after; the saved '
+                                       'trees are then grown on all new samples (0 skips the held-out fit)')
+    
+    # Compact command
+    compact_parser = subparsers.add_parser('compact',
+                                           help='Prune a saved forest to a latency or size budget within an accuracy drop')
+    compact_parser.add_argument('--model', required=True, help='Saved forest (.pkl or .vem)')
+    compact_parser.add_argument('--output', required=True, help='Compacted model path (.vem)')
+    compact_source = compact_parser.add_mutually_exclusive_group(required=True)
+    compact_source.add_argument('--data', help='Held-out data directory the model was not trained on')
+    compact_source.add_argument('--store', help='Held-out feature store the model was not trained on')
+    compact_parser.add_argument('--max-accuracy-drop', type=float, default=0.01,
+                                help='Largest allowed loss of held-out accuracy (absolute, e.g. 0.01 = one point)')
+    compact_parser.add_argument('--latency-budget-ms', type=float, default=None,
+                                help='Keep the most accurate model whose single-row p99 latency fits this budget '
+                                     '(default: keep the smallest model within the accuracy drop)')
+    compact_parser.add_argument('--max-size-kb', type=float, default=None, help='Largest allowed model file size')
+    compact_parser.add_argument('--report', help='Write the before/after report as JSON here')
+    compact_parser.add_argument('--workers', type=int, default=None, help='Feature extraction processes (default: all cores)')
+    compact_parser.add_argument('--cache-dir', default=None, help='Feature cache directory')
+    compact_parser.add_argument('--emotions', nargs='+', choices=EMOTIONS, help='With --store: use these emotions only')
+    compact_parser.add_argument('--per-label', type=int, default=None, help='With --store: sample at most N rows per emotion')
+    compact_parser.add_argument('--fraction', type=float, default=None, help='With --store: sample this fraction of each emotion')
+    
+    # Manifest command
+    manifest_parser = subparsers.add_parser('manifest', help='Scan a dataset once into a manifest for sharded extraction')
+    manifest_parser.add_argument('--data', required=True, help='Path to training data directory')
+    manifest_parser.add_argument('--output', default='manifest.jsonl', help='Manifest path')
+    
+    # Merge command
+    merge_parser = subparsers.add_parser('merge', help='Merge the part stores of a sharded extraction')
+    merge_parser.add_argument('--parts', required=True, help='Parts directory given as --store to extract --manifest')
+    merge_parser.add_argument('--store', required=True, help='Output feature store directory')
+    merge_parser.add_argument('--allow-partial', action='store_true', help='Merge even if some shards have not finished')
     
     # Predict command
     predict_parser = subparsers.add_parser('predict', help='Predict emotion from audio file')
-    predict_parser.add_argument('--audio', required=True, help='Path to audio file')
+    predict_parser.add_argument('--audio', required=True, nargs='+', help='Path to one or more audio files')
     predict_parser.add_argument('--model', default='models/emotion_model.pkl', help='Path to trained model')
+    predict_parser.add_argument('--backend', choices=BACKENDS, default='auto', help=BACKEND_HELP)
+    predict_parser.add_argument('--resample-quality', choices=RESAMPLE_QUALITIES, default='high', help=RESAMPLE_HELP)
+    predict_parser.add_argument('--audio-cache-dir', default=None, help='Cache decoded, resampled audio here')
+    add_vad_arguments(predict_parser, '--trim-silence', 'Trim leading and trailing silence before feature extraction')
+    
+    # Convert command
+    convert_parser = subparsers.add_parser('convert', help='Convert a pickled model to the compact .vem format')
+    convert_parser.add_argument('--model', required=True, help='Path to pickled model')
+    convert_parser.add_argument('--output', help='Output path (default: model path with .vem extension)')
+    
+    # Timeline command
+    timeline_parser = subparsers.add_parser('timeline', help='Per-segment emotion timeline for a long recording (JSONL)')
+    timeline_parser.add_argument('--audio', required=True, help='Path to audio file')
+    timeline_parser.add_argument('--model', default='models/emotion_model.pkl', help='Path to trained model')
+    timeline_parser.add_argument('--output', help='JSONL output path (default: stdout)')
+    timeline_parser.add_argument('--window', type=float, default=2.0, help='Segment length in seconds')
+    timeline_parser.add_argument('--hop', type=float, default=1.0, help='Seconds between segment starts')
+    timeline_parser.add_argument('--incremental', action='store_true',
+                                 help='Reuse spectral frames shared by overlapping segments (same features; hop rounded to 512 samples)')
+    timeline_parser.add_argument('--backend', choices=BACKENDS, default='auto', help=BACKEND_HELP)
+    timeline_parser.add_argument('--resample-quality', choices=RESAMPLE_QUALITIES, default='high', help=RESAMPLE_HELP)
+    add_vad_arguments(timeline_parser, '--vad', 'Skip windows without speech (no segment is written for them)')
     
     # Real-time command
     realtime_parser = subparsers.add_parser('realtime', help='Start real-time emotion detection')
     realtime_parser.add_argument('--model', default='models/emotion_model.pkl', help='Path to trained model')
+    realtime_parser.add_argument('--window', type=float, default=2.0, help='Analysis window length in seconds')
+    realtime_parser.add_argument('--hop', type=float, default=1.0, help='Seconds between consecutive windows')
+    realtime_parser.add_argument('--overload', choices=['drop_oldest', 'skip', 'block'], default=None,
+                                 help='What to do with new windows when inference falls behind '
+                                      '(default: drop_oldest for live or --paced input, block for unpaced replay)')
+    realtime_parser.add_argument('--incremental', action='store_true',
+                                 help='Reuse spectral frames shared by overlapping windows (same features; hop rounded to 512 samples)')
+    realtime_parser.add_argument('--source', choices=['mic', 'file', 'stdin'], default='mic',
+                                 help='Audio input: microphone, audio file or raw mono PCM on stdin')
+    realtime_parser.add_argument('--input', help='Audio file to replay with --source file')
+    realtime_parser.add_argument('--paced', action='store_true',
+                                 help='Replay file/stdin input at real-time speed instead of as fast as possible')
+    realtime_parser.add_argument('--pcm-dtype', choices=['int16', 'float32'], default='int16',
+                                 help='Sample format of raw PCM on stdin')
+    realtime_parser.add_argument('--rate', type=int, default=22050, help='Processing sample rate (stdin PCM must match)')
+    realtime_parser.add_argument('--backend', choices=BACKENDS, default='auto', help=BACKEND_HELP)
+    realtime_parser.add_argument('--resample-quality', choices=RESAMPLE_QUALITIES, default='high', help=RESAMPLE_HELP)
+    add_vad_arguments(realtime_parser, '--vad', 'Skip extraction and inference on windows without speech')
+    
+    # Multi-stream command
+    multistream_parser = subparsers.add_parser('multistream',
+                                               help='Real-time detection on many concurrent streams with one model')
+    multistream_parser.add_argument('--model', default='models/emotion_model.pkl', help='Path to trained model')
+    multistream_parser.add_argument('--input', required=True, nargs='+', help='Audio files to replay as streams')
+    multistream_parser.add_argument('--lines', type=int, default=None,
+                                    help='Number of concurrent streams, cycling through --input (default: one per file)')
+    multistream_parser.add_argument('--output', help='Write results as JSON lines here instead of printing them')
+    multistream_parser.add_argument('--window', type=float, default=2.0, help='Analysis window length in seconds')
+    multistream_parser.add_argument('--hop', type=float, default=1.0, help='Seconds between consecutive windows')
+    multistream_parser.add_argument('--max-batch', type=int, default=64, help='Most windows scored in one predict call')
+    multistream_parser.add_argument('--queue-size', type=int, default=4,
+                                    help='Windows a stream may have waiting before --overload applies')
+    multistream_parser.add_argument('--overload', choices=['drop_oldest', 'block'], default=None,
+                                    help='What a stream does with new windows when scoring falls behind '
+                                         '(default: drop_oldest with --paced, block for unpaced replay)')
+    multistream_parser.add_argument('--paced', action='store_true', help='Replay inputs at real-time speed')
+    multistream_parser.add_argument('--rate', type=int, default=22050, help='Processing sample rate')
+    multistream_parser.add_argument('--backend', choices=BACKENDS, default='auto', help=BACKEND_HELP)
+    multistream_parser.add_argument('--resample-quality', choices=RESAMPLE_QUALITIES, default='high', help=RESAMPLE_HELP)
+    add_vad_arguments(multistream_parser, '--vad', 'Skip extraction and inference on windows without speech')
+    
+    # Serve command
+    serve_parser = subparsers.add_parser('serve', help='Run a local HTTP inference server with micro-batching')
+    serve_parser.add_argument('--model', default='models/emotion_model.pkl', help='Path to trained model')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='Interface to bind (default: localhost only)')
+    serve_parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    serve_parser.add_argument('--max-batch', type=int, default=32, help='Most feature rows scored in one predict call')
+    serve_parser.add_argument('--max-delay-ms', type=float, default=5.0,
+                              help='Longest a request waits for others to join its batch')
+    serve_parser.add_argument('--workers', type=int, default=None, help='Feature extraction threads (default: all cores)')
+    serve_parser.add_argument('--backend', choices=BACKENDS, default='auto', help=BACKEND_HELP)
+    serve_parser.add_argument('--resample-quality', choices=RESAMPLE_QUALITIES, default='high', help=RESAMPLE_HELP)
+    serve_parser.add_argument('--prediction-cache-size', type=int, default=0,
+                              help='Answer resubmitted audio from an LRU cache of this many results (0: off)')
     
     args = parser.parse_args()
     
+    if args.metrics:
+        from src import instrumentation
+        instrumentation.enable(instrumentation.sink_for_path(args.metrics))
+    
+    try:
+        run_command(parser, args)
+    finally:
+        if args.metrics:
+            instrumentation.disable()
+
+def run_command(parser, args):
+    """Dispatch the parsed subcommand"""
     if args.command == 'train':
-        train_model(args.data, args.output)
+        train_model(args.data, args.output, args.workers, args.cache_dir, args.cache_size_mb,
+                    args.resample_quality, args.audio_cache_dir, args.audio_cache_size_mb, args.jobs, args.holdout,
+                    args.store, args.emotions, args.per_label, args.fraction, make_vad(args), args.model_type)
+    elif args.command == 'compare-models':
+        compare_models_command(args.data, args.store, args.model_types, args.holdout, args.jobs, args.batch_size,
+                               args.latency_budget_ms, args.max_size_kb, args.output, args.models_dir, args.workers,
+                               args.cache_dir, args.emotions, args.per_label, args.fraction)
+    elif args.command == 'extract':
+        processor_options = dict(cache_dir=args.cache_dir, resample_quality=args.resample_quality,
+                                 audio_cache_dir=args.audio_cache_dir, vad=make_vad(args))
+        if args.manifest:
+            extract_manifest_shard(args.manifest, args.shard, args.store, args.workers, args.data_root, args.shard_rows,
+                                   **processor_options)
+        else:
+            extract_to_store(args.data, args.store, args.workers, args.shard_rows, **processor_options)
+    elif args.command == 'compact':
+        compact_model_command(args.model, args.output, args.data, args.store, args.max_accuracy_drop,
+                              args.latency_budget_ms, args.max_size_kb, args.report, args.workers, args.cache_dir,
+                              args.emotions, args.per_label, args.fraction)
+    elif args.command == 'manifest':
+        write_manifest_command(args.data, args.output)
+    elif args.command == 'merge':
+        merge_parts_command(args.parts, args.store, args.allow_partial)
+    elif args.command == 'add-trees':
+        add_trees(args.model, args.data, args.output, args.trees, args.workers, args.cache_dir, args.jobs, args.holdout,
+                  args.cache_size_mb, args.resample_quality, args.audio_cache_dir, args.audio_cache_size_mb, make_vad(args))
     elif args.command == 'predict':
-        predict_emotion(args.audio, args.model)
+        predict_emotion(args.audio, args.model, args.backend, args.resample_quality, args.audio_cache_dir, make_vad(args))
+    elif args.command == 'convert':
+        convert_model(args.model, args.output or os.path.splitext(args.model)[0] + '.vem')
+    elif args.command == 'timeline':
+        emotion_timeline_command(args.audio, args.model, args.output, args.window, args.hop, args.incremental,
+                                 args.backend, args.resample_quality, make_vad(args))
     elif args.command == 'realtime':
-        real_time_detection(args.model)
+        real_time_detection(
+            args.model, args.window, args.hop, args.overload, args.incremental,
+            source=args.source, input_path=args.input, paced=args.paced,
+            pcm_dtype=args.pcm_dtype, sample_rate=args.rate, backend=args.backend,
+            resample_quality=args.resample_quality, vad=make_vad(args)
+        )
+    elif args.command == 'multistream':
+        multi_stream_detection(
+            args.model, args.input, args.lines, args.output, args.window, args.hop, args.max_batch,
+            args.queue_size, args.paced, args.rate, args.backend, args.resample_quality, make_vad(args), args.overload
+        )
+    elif args.command == 'serve':
+        serve(args.model, args.host, args.port, args.max_batch, args.max_delay_ms, args.workers, args.backend,
+              args.resample_quality, args.prediction_cache_size)
     else:
         parser.print_help()
 
@@ -0,0 +1,85 @@
+import os
+import hashlib
+import numpy as np
+
+class DecodedAudioCache:
+    """Size-bounded directory of decoded, resampled signals stored as ``.npy`` files.
+    
+    Entries are keyed on the source file's absolute path, size and mtime
+    together with the target rate and resampler quality, so an edited file
+    or a different resampling setting misses the cache. Hits are
+    memory-mapped rather than read, and each file's mtime doubles as its
+    last-used time for LRU eviction down to 90% of ``max_bytes``. Writes go
+    through a temporary file and an atomic rename, so several processes can
+    share one cache directory.
+    """
+    
+    def __init__(self, cache_dir, max_bytes=2 * 1024 * 1024 * 1024):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+    
+    def _entries(self):
+        """(path, size, mtime) of every cached signal"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.npy'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+    
+    def key_for(self, audio_path, sr, quality):
+        """Cache key for a file decoded at ``sr`` with a resampler quality tier"""
+        path = os.path.abspath(audio_path)
+        stat = os.stat(path)
+        return hashlib.blake2b(
+            f"{path}:{stat.st_size}:{stat.st_mtime_ns}:sr={sr}:{quality}".encode(), digest_size=20
+        ).hexdigest()
+    
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.npy')
+    
+    def get(self, key):
+        """Return the cached signal (a read-only memory map) for a key, or None"""
+        path = self._path(key)
+        try:
+            y = np.load(path, mmap_mode='r')
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return y
+    
+    def put(self, key, y):
+        """Store a signal, evicting least recently used entries if over budget"""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.asarray(y, dtype=np.float32))
+        self._total_bytes += os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+    
+    def _evict(self):
+        """Drop least recently used signals until the cache is back under 90% of its budget"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._total_bytes = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        
+        for path, size, _ in entries:
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._total_bytes -= size
\ No newline at end of file
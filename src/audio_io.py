@@ -0,0 +1,123 @@
+import io
+import os
+import numpy as np
+import librosa
+
+# Scale factor mapping int16 PCM onto [-1.0, 1.0)
+INT16_SCALE = 1.0 / 32768.0
+
+# memoryview format codes we can interpret without being told the dtype
+_MEMORYVIEW_DTYPES = {'f': np.float32, 'h': np.int16}
+
+# Resampler tiers, slowest and most accurate first, mapped to soxr recipes.
+# 'high' is what librosa.load uses by default, so features are unchanged.
+RESAMPLE_QUALITIES = {'best': 'VHQ', 'high': 'HQ', 'medium': 'MQ', 'fast': 'LQ'}
+DEFAULT_RESAMPLE_QUALITY = 'high'
+
+def is_audio_path(audio):
+    """Return True if ``audio`` refers to a file rather than in-memory samples"""
+    return isinstance(audio, (str, os.PathLike))
+
+def pcm_to_float(samples):
+    """Convert an integer PCM array to float32, passing float arrays through untouched"""
+    if samples.dtype == np.int16:
+        # One allocation: multiply straight into a float32 output
+        return np.multiply(samples, INT16_SCALE, dtype=np.float32)
+    if not np.issubdtype(samples.dtype, np.floating):
+        raise ValueError(f"Unsupported sample dtype: {samples.dtype}")
+    return samples
+
+def buffer_to_signal(buffer, pcm_dtype=None):
+    """View a bytes/memoryview PCM buffer as a float signal without copying float32 data"""
+    if pcm_dtype is None:
+        fmt = getattr(buffer, 'format', None)
+        pcm_dtype = _MEMORYVIEW_DTYPES.get(fmt, np.float32)
+    samples = np.frombuffer(buffer, dtype=pcm_dtype)
+    return pcm_to_float(samples)
+
+def resample(y, orig_sr, target_sr, quality=DEFAULT_RESAMPLE_QUALITY):
+    """Resample a mono signal with soxr; a no-op when the rates already match"""
+    if orig_sr == target_sr:
+        return y
+    if quality not in RESAMPLE_QUALITIES:
+        raise ValueError(f"Unknown resample quality: {quality} (expected one of {', '.join(RESAMPLE_QUALITIES)})")
+    
+    import soxr
+    y_hat = soxr.resample(y, orig_sr, target_sr, quality=RESAMPLE_QUALITIES[quality])
+    # Same output length as librosa.resample
+    return librosa.util.fix_length(y_hat, size=int(np.ceil(len(y) * target_sr / orig_sr)))
+
+def decode_file(path):
+    """Decode an audio file to mono float32 at its native rate; returns (y, sr).
+    
+    soundfile (libsndfile, which also reads MP3 from version 1.1) is used
+    directly; only files it cannot open go through librosa's slower
+    audioread fallback.
+    """
+    import soundfile as sf
+    
+    try:
+        y, sr = sf.read(path, dtype='float32', always_2d=True)
+    except RuntimeError:
+        # SoundFileRuntimeError (a RuntimeError subclass) on newer soundfile
+        return librosa.load(path, sr=None, mono=True)
+    y = y[:, 0] if y.shape[1] == 1 else y.mean(axis=1, dtype=np.float32)
+    return y, sr
+
+def load_audio_file(path, sr=22050, quality=DEFAULT_RESAMPLE_QUALITY, cache=None):
+    """Decode a file and resample it to ``sr`` (``None`` keeps the native rate).
+    
+    Files already at ``sr`` are never resampled. With a ``DecodedAudioCache``
+    the decoded, resampled signal is served from disk on later calls.
+    """
+    key = None
+    if cache is not None:
+        key = cache.key_for(path, sr, quality)
+        y = cache.get(key)
+        if y is not None:
+            return y, sr
+    
+    y, file_sr = decode_file(path)
+    if sr is None:
+        return y, file_sr
+    y = resample(y, file_sr, sr, quality)
+    
+    if cache is not None:
+        cache.put(key, y)
+    return y, sr
+
+def load_signal(audio, sr=22050, pcm_dtype=None, quality=DEFAULT_RESAMPLE_QUALITY, cache=None):
+    """Turn a file path, numpy array or PCM buffer into a mono float signal.
+    
+    Returns ``(y, sr)``. Paths are decoded and resampled to ``sr`` (see
+    ``load_audio_file``); arrays and buffers are assumed to already be at
+    ``sr`` and are returned as views whenever their dtype allows it.
+    """
+    if is_audio_path(audio):
+        return load_audio_file(audio, sr=sr, quality=quality, cache=cache)
+    
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        return buffer_to_signal(audio, pcm_dtype), sr
+    
+    y = pcm_to_float(np.asarray(audio))
+    if y.ndim > 1:
+        y = librosa.to_mono(y)
+    return y, sr
+
+def decode_audio(data, sr=22050, quality=DEFAULT_RESAMPLE_QUALITY):
+    """Decode an in-memory audio file (WAV, FLAC, OGG...) to a mono float32 signal at ``sr``"""
+    import soundfile as sf
+    
+    y, file_sr = sf.read(io.BytesIO(data), dtype='float32', always_2d=True)
+    y = y[:, 0] if y.shape[1] == 1 else y.mean(axis=1, dtype=np.float32)
+    return resample(y, file_sr, sr, quality), sr
+
+def probe_file(path):
+    """Duration in seconds and native sample rate of an audio file, read from its header"""
+    import soundfile as sf
+    
+    try:
+        info = sf.info(path)
+        return info.duration, info.samplerate
+    except RuntimeError:
+        return librosa.get_duration(path=path), librosa.get_samplerate(path)
\ No newline at end of file
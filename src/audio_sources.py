@@ -0,0 +1,187 @@
+import sys
+import time
+import queue
+import numpy as np
+from .audio_io import buffer_to_signal, RESAMPLE_QUALITIES, DEFAULT_RESAMPLE_QUALITY
+
+class AudioSource:
+    """Base class for streams of mono float32 audio chunks.
+    
+    Subclasses implement ``_read_chunks`` as a generator of sample arrays at
+    ``sample_rate``. With ``paced=True`` chunks are released no faster than
+    real time, which mimics a live device; unpaced sources run as fast as
+    the consumer can take them, for benchmarks and offline processing.
+    """
+    
+    def __init__(self, sample_rate=22050, chunk_size=1024, paced=False):
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.paced = paced
+        self.input_overflows = 0
+    
+    @property
+    def live(self):
+        """Whether audio arrives in real time whether or not it is consumed (a device or a paced replay)"""
+        return self.paced
+    
+    def chunks(self):
+        """Yield float32 sample arrays until the source is exhausted or closed"""
+        started = time.perf_counter()
+        emitted = 0
+        
+        reader = self._read_chunks()
+        try:
+            for chunk in reader:
+                if self.paced:
+                    # Sleep until this chunk would have arrived from a live device
+                    delay = started + emitted / self.sample_rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                emitted += len(chunk)
+                yield chunk
+        finally:
+            reader.close()
+    
+    def _read_chunks(self):
+        raise NotImplementedError
+    
+    def close(self):
+        """Release any underlying device or file"""
+        pass
+
+class MicrophoneSource(AudioSource):
+    """Live capture from the default input device through PyAudio.
+    
+    The PortAudio callback only copies bytes into a queue, so capture keeps
+    running however slowly the consumer drains it.
+    """
+    
+    def __init__(self, sample_rate=22050, chunk_size=1024, max_pending=256):
+        super().__init__(sample_rate, chunk_size, paced=False)
+        import pyaudio
+        self._pyaudio = pyaudio
+        self.audio = pyaudio.PyAudio()
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._stream = None
+        self._closed = False
+    
+    @property
+    def live(self):
+        return True
+    
+    def _callback(self, in_data, frame_count, time_info, status):
+        if status & self._pyaudio.paInputOverflow:
+            self.input_overflows += 1
+        try:
+            self._pending.put_nowait(in_data)
+        except queue.Full:
+            self.input_overflows += 1
+        return (None, self._pyaudio.paComplete if self._closed else self._pyaudio.paContinue)
+    
+    def _read_chunks(self):
+        self._closed = False
+        self._stream = self.audio.open(
+            format=self._pyaudio.paFloat32,
+            channels=1,
+            rate=self.sample_rate,
+            input=True,
+            frames_per_buffer=self.chunk_size,
+            stream_callback=self._callback
+        )
+        self._stream.start_stream()
+        
+        try:
+            while not self._closed:
+                try:
+                    data = self._pending.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                yield np.frombuffer(data, dtype=np.float32)
+        finally:
+            self._closed = True
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+    
+    def close(self):
+        self._closed = True
+        if self.audio is not None:
+            self.audio.terminate()
+            self.audio = None
+
+class FileSource(AudioSource):
+    """Stream a WAV/FLAC (or any libsndfile format) file block by block.
+    
+    Multi-channel audio is downmixed and, when the file's rate differs from
+    ``sample_rate``, resampled with a streaming resampler, so memory use is
+    independent of file length.
+    """
+    
+    def __init__(self, path, sample_rate=22050, chunk_size=1024, paced=False, resample_quality=DEFAULT_RESAMPLE_QUALITY):
+        super().__init__(sample_rate, chunk_size, paced)
+        self.path = path
+        self.resample_quality = resample_quality
+    
+    def _read_chunks(self):
+        import soundfile as sf
+        
+        with sf.SoundFile(self.path) as f:
+            resampler = None
+            if f.samplerate != self.sample_rate:
+                import soxr
+                resampler = soxr.ResampleStream(f.samplerate, self.sample_rate, 1, dtype='float32',
+                                                quality=RESAMPLE_QUALITIES[self.resample_quality])
+            
+            # Read roughly chunk_size output samples per block
+            blocksize = max(1, int(self.chunk_size * f.samplerate / self.sample_rate))
+            
+            for block in f.blocks(blocksize=blocksize, dtype='float32', always_2d=True):
+                chunk = block[:, 0] if block.shape[1] == 1 else block.mean(axis=1, dtype=np.float32)
+                if resampler is not None:
+                    chunk = resampler.resample_chunk(chunk)
+                if len(chunk):
+                    yield chunk
+            
+            if resampler is not None:
+                tail = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+                if len(tail):
+                    yield tail
+
+class PCMStreamSource(AudioSource):
+    """Raw mono PCM (float32 or int16) read from a binary stream such as stdin or a pipe.
+    
+    The stream must already be at ``sample_rate``.
+    """
+    
+    def __init__(self, stream=None, sample_rate=22050, chunk_size=1024, pcm_dtype='int16', paced=False):
+        super().__init__(sample_rate, chunk_size, paced)
+        self.stream = stream if stream is not None else sys.stdin.buffer
+        self.pcm_dtype = np.dtype(pcm_dtype)
+    
+    def _read_chunks(self):
+        frame_bytes = self.pcm_dtype.itemsize
+        nbytes = self.chunk_size * frame_bytes
+        remainder = b''
+        
+        while True:
+            data = self.stream.read(nbytes)
+            if not data:
+                break
+            data = remainder + data
+            
+            # Keep any partial sample for the next read
+            usable = len(data) - len(data) % frame_bytes
+            remainder = data[usable:]
+            if usable:
+                yield buffer_to_signal(memoryview(data)[:usable], self.pcm_dtype)
+
+class GeneratorSource(AudioSource):
+    """Wrap any iterable of sample arrays, e.g. synthetic audio for tests and load generation"""
+    
+    def __init__(self, iterable, sample_rate=22050, paced=False):
+        super().__init__(sample_rate, chunk_size=None, paced=paced)
+        self.iterable = iterable
+    
+    def _read_chunks(self):
+        for chunk in self.iterable:
+            yield np.asarray(chunk, dtype=np.float32)
\ No newline at end of file
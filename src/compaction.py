@@ -0,0 +1,161 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+from .voice_emotion import VoiceEmotionAnalyzer
+from .forest_engine import NativeForest
+from .model_format import COMPACT_MODEL_EXTENSION
+from .model_evaluation import measure_saved_model
+
+# Post-training forest compaction. Native inference costs one gather step
+# per tree per level of depth, so latency scales with n_trees * max_depth
+# and file size with the number of nodes kept. Candidates keep the first
+# k trees (trees are fitted independently, so any k of them are as good
+# as any other k) cut at depth d; a node at the depth limit becomes a leaf
+# predicting its class distribution, which the flattened arrays already
+# store for every node. The cheapest candidate within the allowed accuracy
+# drop on held-out data is kept, or with a latency budget the most accurate
+# one that meets it.
+
+TREE_FRACTIONS = (1.0, 0.75, 0.5, 0.35, 0.25, 0.15, 0.1, 0.05)
+
+def node_depths(arrays):
+    """Depth of every node reachable from a tree root (-1 for unreachable nodes)"""
+    n_nodes = len(arrays['feature'])
+    is_leaf = arrays['left'] == np.arange(n_nodes)
+    depth = np.full(n_nodes, -1, dtype=np.int32)
+    
+    frontier = np.asarray(arrays['tree_offsets'][:-1], dtype=np.intp)
+    level = 0
+    while len(frontier):
+        depth[frontier] = level
+        frontier = frontier[~is_leaf[frontier]]
+        frontier = np.concatenate([arrays['left'][frontier], arrays['right'][frontier]])
+        level += 1
+    return depth
+
+def compact_arrays(arrays, n_trees=None, max_depth=None, depth=None):
+    """Node arrays of the first ``n_trees`` trees cut at ``max_depth``; returns (arrays, depth reached).
+    
+    ``arrays`` is in ``flatten_forest`` layout; ``depth`` may pass in a
+    precomputed ``node_depths(arrays)``. Nodes below the cut are dropped and
+    the rest renumbered, keeping each tree's nodes contiguous.
+    """
+    offsets = arrays['tree_offsets']
+    n_trees = len(offsets) - 1 if n_trees is None else n_trees
+    depth = node_depths(arrays) if depth is None else depth
+    
+    keep = depth >= 0
+    keep[offsets[n_trees]:] = False
+    if max_depth is not None:
+        keep &= depth <= max_depth
+    
+    old = np.flatnonzero(keep)
+    new_index = np.cumsum(keep) - 1
+    own = np.arange(len(old))
+    becomes_leaf = (arrays['left'][old] == old) | (depth[old] == max_depth)
+    
+    compacted = {
+        'tree_offsets': np.append(new_index[offsets[:n_trees]], len(old)).astype(np.int64),
+        'feature': np.where(becomes_leaf, 0, arrays['feature'][old]).astype(np.int32),
+        'threshold': np.asarray(arrays['threshold'][old]),
+        'left': np.where(becomes_leaf, own, new_index[arrays['left'][old]]).astype(np.int32),
+        'right': np.where(becomes_leaf, own, new_index[arrays['right'][old]]).astype(np.int32),
+        'value': np.asarray(arrays['value'][old]),
+        'classes': arrays['classes'],
+    }
+    return compacted, int(depth[old].max())
+
+def _candidates(n_trees, max_depth):
+    """(trees, depth) pairs to try, from the full forest down"""
+    tree_counts = sorted({max(1, int(round(n_trees * fraction))) for fraction in TREE_FRACTIONS}, reverse=True)
+    return [(trees, depth) for trees in tree_counts for depth in range(max_depth, 0, -1)]
+
+def _accuracy(model, X_scaled, y):
+    return float(np.mean(model.predict(X_scaled) == np.asarray(y)))
+
+def compact_model(model_path, output_path, X, y, max_accuracy_drop=0.01, latency_budget_ms=None,
+                  max_size_bytes=None, batch_size=64, repeats=100):
+    """Shrink a saved forest to fit a latency or size budget within an accuracy drop.
+    
+    ``X``/``y`` are held-out samples (features and integer labels) the
+    model was not trained on. Every candidate within ``max_accuracy_drop``
+    of the full forest's accuracy on them and within ``max_size_bytes`` is
+    considered; with ``latency_budget_ms`` each is saved and its single-row
+    p99 latency measured, and the most accurate candidate under the budget
+    wins. Without one the cheapest (fewest tree-levels, then bytes) wins.
+    The winner is written to ``output_path`` (``.vem``). Returns a report
+    dict with ``before`` (the unpruned forest saved as ``.vem``) and
+    ``after`` measurements, ``after`` None when no candidate qualifies, and
+    ``input`` measuring the original file when it is in another format.
+    """
+    if not output_path.endswith(COMPACT_MODEL_EXTENSION):
+        raise ValueError(f"Compacted models are written in the compact format; use a {COMPACT_MODEL_EXTENSION} output path")
+    
+    analyzer = VoiceEmotionAnalyzer(model_path, backend='native')
+    forest = analyzer.model
+    arrays = forest.to_arrays()
+    depth = node_depths(arrays)
+    X_scaled = analyzer.scaler.transform(X) if analyzer.scaler is not None else np.asarray(X)
+    baseline = _accuracy(forest, X_scaled, y)
+    
+    work_dir = tempfile.mkdtemp(prefix='compact-')
+    try:
+        # The unpruned forest in the output format, so before/after differ only by pruning
+        full_path = os.path.join(work_dir, f'full{COMPACT_MODEL_EXTENSION}')
+        analyzer.save_model(full_path)
+        
+        candidates = []
+        for n_trees, max_depth in _candidates(forest.n_trees, forest.max_depth):
+            compacted, reached = compact_arrays(arrays, n_trees, max_depth, depth)
+            if reached < max_depth:
+                # Same forest as a shallower cut already in the list
+                continue
+            model = NativeForest(compacted, forest.n_features_in_, reached)
+            accuracy = _accuracy(model, X_scaled, y)
+            if accuracy < baseline - max_accuracy_drop - 1e-9:
+                continue
+            
+            path = os.path.join(work_dir, f'{n_trees}x{max_depth}{COMPACT_MODEL_EXTENSION}')
+            analyzer.model = model
+            analyzer.save_model(path)
+            size_bytes = os.path.getsize(path)
+            if max_size_bytes is not None and size_bytes > max_size_bytes:
+                continue
+            candidates.append({'n_trees': n_trees, 'max_depth': max_depth, 'n_nodes': len(compacted['feature']),
+                               'accuracy': accuracy, 'size_bytes': size_bytes, 'path': path})
+        
+        if latency_budget_ms is not None:
+            for candidate in candidates:
+                candidate['single_p99_ms'] = measure_saved_model(candidate['path'], X[:1], y[:1], loads=1,
+                                                                 batch_size=1, repeats=repeats)['single_p99_ms']
+            candidates = [c for c in candidates if c['single_p99_ms'] <= latency_budget_ms]
+            best = max(candidates, key=lambda c: (c['accuracy'], -c['single_p99_ms']), default=None)
+        else:
+            best = min(candidates, key=lambda c: (c['n_trees'] * c['max_depth'], c['size_bytes']), default=None)
+        
+        report = {
+            'baseline_accuracy': baseline,
+            'max_accuracy_drop': max_accuracy_drop,
+            'latency_budget_ms': latency_budget_ms,
+            'max_size_bytes': max_size_bytes,
+            'n_eval': int(len(y)),
+            'candidates_within_budget': len(candidates),
+            'before': dict(n_trees=forest.n_trees, max_depth=forest.max_depth, n_nodes=len(arrays['feature']),
+                           **measure_saved_model(full_path, X, y, backend='native', batch_size=batch_size)),
+            'after': None,
+            # The input file itself when it is not already compact (e.g. a pickle): format change included
+            'input': None,
+        }
+        if not model_path.endswith(COMPACT_MODEL_EXTENSION):
+            report['input'] = dict(n_trees=forest.n_trees, max_depth=forest.max_depth, n_nodes=len(arrays['feature']),
+                                   **measure_saved_model(model_path, X, y, backend='native', batch_size=batch_size))
+        if best is None:
+            return report
+        
+        shutil.copyfile(best['path'], output_path)
+        report['after'] = dict(n_trees=best['n_trees'], max_depth=best['max_depth'], n_nodes=best['n_nodes'],
+                               **measure_saved_model(output_path, X, y, backend='native', batch_size=batch_size))
+        return report
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
\ No newline at end of file
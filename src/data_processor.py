@@ -1,59 +1,337 @@
 import os
-import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from .voice_emotion import VoiceEmotionAnalyzer
+from .feature_cache import FeatureCache
+from .audio_cache import DecodedAudioCache
+from .feature_store import FeatureStore
+from .manifest import read_manifest, manifest_shard, part_store_path, write_part_marker
+from .audio_io import DEFAULT_RESAMPLE_QUALITY, probe_file
+from . import instrumentation
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac')
+
+DEFAULT_EMOTIONS_MAPPING = {
+    'neutral': 0, 'happy': 1, 'sad': 2, 'angry': 3,
+    'fear': 4, 'disgust': 5, 'surprise': 6
+}
+
+# Per-process analyzer used by pool workers
+_worker_analyzer = None
+
+def _make_analyzer(resample_quality, audio_cache_dir, audio_cache_max_bytes, vad=None):
+    """Feature-extraction analyzer with the given decode settings"""
+    audio_cache = DecodedAudioCache(audio_cache_dir, audio_cache_max_bytes) if audio_cache_dir else None
+    return VoiceEmotionAnalyzer(resample_quality=resample_quality, audio_cache=audio_cache, vad=vad)
+
+def _init_worker(instrumented=False, decode_options=(DEFAULT_RESAMPLE_QUALITY, None, 0, None)):
+    """Limit native thread pools to one thread in a dataset worker.
+    
+    Workers start with numpy (and so BLAS/OpenMP) already loaded, so
+    ``*_NUM_THREADS`` variables set here would be read too late; the live
+    pools are capped through threadpoolctl and numba before the analyzer
+    is built. With ``instrumented`` the worker collects stage timings
+    locally and ships them back with each result for the parent to replay;
+    sinks inherited from a forked parent are never written to from here.
+    ``decode_options`` are the parent's ``_make_analyzer`` arguments.
+    """
+    global _worker_analyzer
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+    
+    try:
+        import numba
+        numba.set_num_threads(1)
+    except (ImportError, ValueError):
+        pass
+    
+    _worker_analyzer = _make_analyzer(*decode_options)
+    instrumentation.set_sinks([instrumentation.CollectingSink()] if instrumented else [])
+
+def _extract_in_worker(audio_path):
+    """Extract features for one file inside a pool worker; returns (features, stage events)"""
+    with instrumentation.stage('dataset.file'):
+        features = _worker_analyzer.extract_features(audio_path)
+    
+    events = []
+    for sink in instrumentation.get_sinks():
+        events.extend(sink.drain())
+    return features, events
+
+def scan_dataset(data_dir, emotions_mapping=None):
+    """List (audio_path, label) pairs under data_dir/<emotion>/ in a stable order"""
+    if emotions_mapping is None:
+        emotions_mapping = DEFAULT_EMOTIONS_MAPPING
+    
+    files = []
+    
+    # One scandir pass per directory; entry types come from the directory listing, not a stat per file
+    with os.scandir(data_dir) as entries:
+        emotion_dirs = sorted((entry.name, entry.path) for entry in entries if entry.is_dir())
+    
+    for emotion_folder, emotion_path in emotion_dirs:
+        if emotion_folder not in emotions_mapping:
+            print(f"Skipping unknown emotion: {emotion_folder}")
+            continue
+        
+        emotion_label = emotions_mapping[emotion_folder]
+        
+        with os.scandir(emotion_path) as entries:
+            audio_files = sorted(
+                (entry.name, entry.path) for entry in entries
+                if entry.name.endswith(AUDIO_EXTENSIONS) and entry.is_file()
+            )
+        files.extend((path, emotion_label) for _, path in audio_files)
+    
+    return files
 
 class DataProcessor:
-    def __init__(self):
-        self.analyzer = VoiceEmotionAnalyzer()
+    def __init__(self, cache_dir=None, cache_max_bytes=512 * 1024 * 1024, resample_quality=DEFAULT_RESAMPLE_QUALITY,
+                 audio_cache_dir=None, audio_cache_max_bytes=2 * 1024 * 1024 * 1024, vad=None):
+        # Decode settings, shared with worker processes; ``vad`` trims silence before extraction
+        self.decode_options = (resample_quality, audio_cache_dir, audio_cache_max_bytes, vad)
+        self.analyzer = _make_analyzer(*self.decode_options)
+        self.cache = FeatureCache(
+            cache_dir, max_bytes=cache_max_bytes, resample_quality=resample_quality, vad=vad
+        ) if cache_dir else None
     
-    def process_dataset(self, data_dir, emotions_mapping=None):
-        """Process audio dataset and extract features"""
-        if emotions_mapping is None:
-            emotions_mapping = {
-                'neutral': 0, 'happy': 1, 'sad': 2, 'angry': 3,
-                'fear': 4, 'disgust': 5, 'surprise': 6
-            }
+    def collect_files(self, data_dir, emotions_mapping=None):
+        """List (audio_path, label) pairs under data_dir/<emotion>/ in a stable order"""
+        return scan_dataset(data_dir, emotions_mapping)
+    
+    def process_dataset(self, data_dir, emotions_mapping=None, n_workers=1):
+        """Process audio dataset and extract features.
+        
+        With ``n_workers > 1`` files are processed in a pool of worker
+        processes; ``n_workers=None`` uses every core. Results are always
+        returned in the same order as ``collect_files``.
+        """
+        files = self.collect_files(data_dir, emotions_mapping)
+        feature_vectors = self.extract_files([path for path, _ in files], n_workers=n_workers)
         
         features = []
         labels = []
         
-        for emotion_folder in os.listdir(data_dir):
-            emotion_path = os.path.join(data_dir, emotion_folder)
-            
-            if not os.path.isdir(emotion_path):
-                continue
-            
-            if emotion_folder not in emotions_mapping:
-                print(f"Skipping unknown emotion: {emotion_folder}")
-                continue
-            
-            emotion_label = emotions_mapping[emotion_folder]
+        for (_, emotion_label), feature_vector in zip(files, feature_vectors):
+            if feature_vector is not None:
+                features.append(feature_vector)
+                labels.append(emotion_label)
+        
+        return np.array(features), np.array(labels)
+    
+    def build_store(self, data_dir, store, emotions_mapping=None, n_workers=1):
+        """Extract a dataset into a ``FeatureStore``, streaming one shard of files at a time.
+        
+        Files already in the store are skipped, so re-running on a grown
+        corpus only extracts the new recordings. Returns the number of rows
+        appended.
+        """
+        return self.store_files(self.collect_files(data_dir, emotions_mapping), store, n_workers=n_workers)
+    
+    def store_files(self, files, store, n_workers=1):
+        """Extract (audio_path, label) pairs into a ``FeatureStore``, one shard of files at a time.
+        
+        Files already in the store are skipped. Returns the number of rows
+        appended.
+        """
+        files = list(files)
+        known = store.existing_paths(path for path, _ in files)
+        files = [(path, label) for path, label in files if os.path.abspath(path) not in known]
+        print(f"Feature store: {len(store)} rows stored, {len(files)} new files")
+        
+        appended = 0
+        for start in range(0, len(files), store.shard_rows):
+            block = files[start:start + store.shard_rows]
+            feature_vectors = self.extract_files([path for path, _ in block], n_workers=n_workers)
             
-            for audio_file in os.listdir(emotion_path):
-                if audio_file.endswith(('.wav', '.mp3', '.flac')):
-                    audio_path = os.path.join(emotion_path, audio_file)
-                    
-                    # Extract features
+            for (path, emotion_label), feature_vector in zip(block, feature_vectors):
+                if feature_vector is None:
+                    continue
+                duration, sample_rate = probe_file(path)
+                store.append(feature_vector, emotion_label, path=path, duration=duration, sample_rate=sample_rate)
+                appended += 1
+            store.flush()
+        
+        return appended
+    
+    def process_manifest_shard(self, manifest_path, shard_index, num_shards, parts_dir, n_workers=1, data_root=None,
+                               shard_rows=4096):
+        """Extract shard ``shard_index`` of ``num_shards`` of a manifest into its part store under ``parts_dir``.
+        
+        Re-running a shard resumes it; a completion marker is written once
+        every file of the shard has been attempted. Returns the marker.
+        """
+        files, manifest_id = read_manifest(manifest_path, data_root)
+        shard = manifest_shard(files, shard_index, num_shards)
+        
+        with FeatureStore(part_store_path(parts_dir, shard_index, num_shards), shard_rows=shard_rows) as store:
+            self.store_files(shard, store, n_workers=n_workers)
+            rows = len(store)
+        return write_part_marker(parts_dir, shard_index, num_shards, manifest_id, files=len(shard), rows=rows)
+    
+    def extract_files(self, audio_paths, n_workers=1):
+        """Extract features for each path, returning None where extraction failed.
+        
+        When a feature cache is configured only new or changed files are
+        extracted; everything else is served from the cache.
+        """
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        
+        results = [None] * len(audio_paths)
+        todo = list(range(len(audio_paths)))
+        keys = {}
+        
+        if self.cache:
+            todo = []
+            for i, audio_path in enumerate(audio_paths):
+                try:
+                    with instrumentation.stage('dataset.cache_lookup'):
+                        keys[i] = self.cache.key_for(audio_path)
+                        results[i] = self.cache.get(keys[i])
+                except OSError as e:
+                    print(f"Error processing {audio_path}: {e}")
+                    continue
+                if results[i] is None:
+                    todo.append(i)
+            print(f"Feature cache: {len(audio_paths) - len(todo)} cached, {len(todo)} to extract")
+        
+        todo_paths = [audio_paths[i] for i in todo]
+        progress = _Progress(len(todo_paths))
+        
+        if n_workers <= 1 or len(todo_paths) <= 1:
+            extracted = []
+            for audio_path in todo_paths:
+                with instrumentation.stage('dataset.file'):
                     feature_vector = self.analyzer.extract_features(audio_path)
-                    
-                    if feature_vector is not None:
-                        features.append(feature_vector)
-                        labels.append(emotion_label)
-                        print(f"Processed: {audio_path}")
+                if feature_vector is None:
+                    instrumentation.record_error('dataset.file')
+                extracted.append(feature_vector)
+                progress.update(failed=feature_vector is None)
+        else:
+            extracted = self._extract_parallel(todo_paths, n_workers, progress)
         
-        return np.array(features), np.array(labels)
+        progress.finish()
+        
+        for i, feature_vector in zip(todo, extracted):
+            results[i] = feature_vector
+            if self.cache and feature_vector is not None and i in keys:
+                self.cache.put(keys[i], feature_vector)
+        
+        if self.cache:
+            self.cache.commit()
+        
+        return results
     
-    def save_processed_data(self, features, labels, output_path):
-        """Save processed features and labels"""
-        data = {
-            'features': features,
-            'labels': labels
-        }
-        np.savez(output_path, **data)
+    def _extract_parallel(self, audio_paths, n_workers, progress):
+        """Fan extraction out over a process pool, retrying files lost to a crashed worker.
+        
+        A worker that dies breaks the whole pool, so every file still in
+        flight is lost with it. Each lost file is then retried on its own in
+        a fresh single-worker pool: only a file that crashes its worker again
+        is marked failed.
+        """
+        results = [None] * len(audio_paths)
+        lost = []
+        
+        with self._pool(n_workers) as pool:
+            futures = {pool.submit(_extract_in_worker, path): i for i, path in enumerate(audio_paths)}
+            
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = self._collect(future)
+                except BrokenProcessPool:
+                    # Worker died (e.g. native crash); retried below
+                    lost.append(i)
+                    continue
+                except Exception as e:
+                    print(f"Error processing {audio_paths[i]}: {e}")
+                progress.update(failed=results[i] is None)
+        
+        if lost:
+            print(f"Worker pool crashed; retrying {len(lost)} files one at a time")
+        for i in sorted(lost):
+            try:
+                with self._pool(1) as pool:
+                    results[i] = self._collect(pool.submit(_extract_in_worker, audio_paths[i]))
+            except BrokenProcessPool:
+                print(f"Error processing {audio_paths[i]}: worker process crashed")
+            except Exception as e:
+                print(f"Error processing {audio_paths[i]}: {e}")
+            progress.update(failed=results[i] is None)
+        
+        return results
+    
+    def _pool(self, n_workers):
+        return ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                   initargs=(instrumentation.enabled(), self.decode_options))
+    
+    def _collect(self, future):
+        """Result of a worker extraction, replaying its stage timings"""
+        features, events = future.result()
+        instrumentation.replay(events)
+        if features is None:
+            instrumentation.record_error('dataset.file')
+        return features
+    
+    def save_processed_data(self, features, labels, output_path, append=False):
+        """Save processed features and labels.
+        
+        A ``.npz`` path is written as a single archive; any other path is a
+        feature store directory, whose rows are replaced unless ``append``.
+        """
+        if output_path.endswith('.npz'):
+            if append:
+                raise ValueError("Cannot append to a .npz archive; save to a feature store directory instead")
+            np.savez(output_path, features=features, labels=labels)
+        else:
+            with FeatureStore(output_path) as store:
+                if not append:
+                    store.clear()
+                for feature_vector, label in zip(features, labels):
+                    store.append(feature_vector, label)
         print(f"Data saved to: {output_path}")
     
-    def load_processed_data(self, data_path):
-        """Load processed features and labels"""
-        data = np.load(data_path)
-        return data['features'], data['labels']
\ No newline at end of file
+    def load_processed_data(self, data_path, per_label=None, fraction=None, seed=0, **filters):
+        """Load processed features and labels from a feature store.
+        
+        Only the selected rows are read: ``filters`` are ``FeatureStore.select``
+        arguments and ``per_label``/``fraction`` draw a stratified subset.
+        ``.npz`` archives are read whole.
+        """
+        if data_path.endswith('.npz'):
+            data = np.load(data_path)
+            return data['features'], data['labels']
+        
+        with FeatureStore(data_path) as store:
+            if per_label is None and fraction is None:
+                ids = store.select(**filters)
+            else:
+                ids = store.stratified_ids(per_label=per_label, fraction=fraction, seed=seed, **filters)
+            return store.load(ids)
+
+class _Progress:
+    """Aggregate progress reporting: one line roughly every 5% of files"""
+    
+    def __init__(self, total, steps=20):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.every = max(1, total // steps)
+    
+    def update(self, failed=False):
+        self.done += 1
+        self.failed += int(failed)
+        if self.done % self.every == 0 and self.done < self.total:
+            self._report()
+    
+    def finish(self):
+        self._report()
+    
+    def _report(self):
+        print(f"Processed {self.done}/{self.total} files ({self.failed} failed)")
\ No newline at end of file
@@ -0,0 +1,135 @@
+import os
+import time
+import sqlite3
+import hashlib
+import numpy as np
+from .features import FEATURE_VERSION
+from .audio_io import DEFAULT_RESAMPLE_QUALITY
+
+class FeatureCache:
+    """Persistent, size-bounded cache of feature vectors keyed on audio content.
+    
+    Entries are addressed by a hash of the file bytes combined with the
+    feature parameters (sample rate, MFCC count and ``FEATURE_VERSION``), so
+    renamed or copied files hit the cache and any change to the feature
+    pipeline misses it. Content hashes are themselves memoised against
+    (path, size, mtime) so unchanged files are not re-read on every run.
+    When the stored vectors exceed ``max_bytes`` the least recently used
+    entries are evicted.
+    """
+    
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, sr=22050, n_mfcc=13,
+                 resample_quality=DEFAULT_RESAMPLE_QUALITY, vad=None):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, 'features.sqlite')
+        self.max_bytes = max_bytes
+        self.params = f"v{FEATURE_VERSION}:sr={sr}:n_mfcc={n_mfcc}"
+        if resample_quality != DEFAULT_RESAMPLE_QUALITY:
+            # Keys made with the default resampler stay valid
+            self.params += f":resample={resample_quality}"
+        if vad is not None:
+            # Trimmed and untrimmed features are cached separately
+            self.params += f":{vad!r}"
+        self.hits = 0
+        self.misses = 0
+        
+        self._db = sqlite3.connect(self.path)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS features (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS features_last_used ON features (last_used);
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest TEXT NOT NULL
+            );
+        """)
+        self._total_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM features"
+        ).fetchone()[0]
+    
+    def file_digest(self, audio_path):
+        """Content hash of a file, reusing the stored hash while size and mtime are unchanged"""
+        path = os.path.abspath(audio_path)
+        stat = os.stat(path)
+        
+        row = self._db.execute(
+            "SELECT size, mtime_ns, digest FROM file_hashes WHERE path = ?", (path,)
+        ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        
+        hasher = hashlib.blake2b(digest_size=20)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                hasher.update(block)
+        digest = hasher.hexdigest()
+        
+        self._db.execute(
+            "INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime_ns, digest)
+        )
+        return digest
+    
+    def key_for(self, audio_path):
+        """Cache key for a file under the current feature parameters"""
+        return hashlib.blake2b(
+            f"{self.file_digest(audio_path)}:{self.params}".encode(), digest_size=20
+        ).hexdigest()
+    
+    def get(self, key):
+        """Return the cached feature vector for a key, or None"""
+        row = self._db.execute("SELECT value FROM features WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        self._db.execute("UPDATE features SET last_used = ? WHERE key = ?", (time.time(), key))
+        return np.frombuffer(row[0], dtype=np.float64).copy()
+    
+    def put(self, key, features):
+        """Store a feature vector, evicting least recently used entries if over budget"""
+        value = np.asarray(features, dtype=np.float64).tobytes()
+        
+        old = self._db.execute("SELECT size FROM features WHERE key = ?", (key,)).fetchone()
+        if old:
+            self._total_bytes -= old[0]
+        
+        self._db.execute(
+            "INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?)",
+            (key, value, len(value), time.time())
+        )
+        self._total_bytes += len(value)
+        
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+    
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of its budget"""
+        target = int(self.max_bytes * 0.9)
+        rows = self._db.execute("SELECT key, size FROM features ORDER BY last_used")
+        
+        doomed = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            doomed.append((key,))
+            self._total_bytes -= size
+        rows.close()
+        
+        self._db.executemany("DELETE FROM features WHERE key = ?", doomed)
+    
+    def commit(self):
+        """Flush pending writes to disk"""
+        self._db.commit()
+    
+    def close(self):
+        """Commit and close the underlying database"""
+        self._db.commit()
+        self._db.close()
\ No newline at end of file
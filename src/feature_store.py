@@ -0,0 +1,270 @@
+import os
+import sqlite3
+import numpy as np
+from .features import FEATURE_VERSION
+
+class FeatureStore:
+    """Append-only, sharded on-disk store of feature vectors.
+    
+    Vectors are written in blocks of ``shard_rows`` to ``shard-NNNNN.npy``
+    files that are memory-mapped on read, so opening a store or loading a
+    subset never reads the whole corpus. A SQLite index beside the shards
+    holds one row per vector (source path, label, duration and native
+    sample rate) and is only updated after a shard has been renamed into
+    place, so an interrupted run loses at most the unflushed block.
+    
+    Rows get consecutive ids in append order; ``select`` and
+    ``stratified_ids`` pick ids from the index and ``load`` gathers just
+    those rows from the shards.
+    """
+    
+    def __init__(self, store_dir, shard_rows=4096, dtype=np.float64):
+        os.makedirs(store_dir, exist_ok=True)
+        self.store_dir = store_dir
+        self.shard_rows = shard_rows
+        self._pending = []
+        self._pending_paths = set()
+        self._mmaps = {}
+        
+        self._db = sqlite3.connect(os.path.join(store_dir, 'index.sqlite'))
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS shards (
+                shard INTEGER PRIMARY KEY,
+                first_id INTEGER NOT NULL,
+                n_rows INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS samples (
+                id INTEGER PRIMARY KEY,
+                path TEXT,
+                label,
+                duration REAL,
+                sample_rate INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS samples_label ON samples (label);
+            CREATE INDEX IF NOT EXISTS samples_path ON samples (path);
+        """)
+        meta = dict(self._db.execute("SELECT key, value FROM meta"))
+        
+        if meta and int(meta['feature_version']) != FEATURE_VERSION:
+            raise ValueError(
+                f"Feature store {store_dir} was written with feature version {meta['feature_version']}, "
+                f"current is {FEATURE_VERSION}"
+            )
+        self.dtype = np.dtype(meta.get('dtype', np.dtype(dtype).str))
+        self.n_features = int(meta['n_features']) if 'n_features' in meta else None
+        
+        shards = self._db.execute("SELECT first_id, n_rows FROM shards ORDER BY shard").fetchall()
+        self._first_ids = [first_id for first_id, _ in shards]
+        self._n_rows = sum(n_rows for _, n_rows in shards)
+    
+    def __len__(self):
+        """Number of flushed rows"""
+        return self._n_rows
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+    
+    def _shard_path(self, shard):
+        return os.path.join(self.store_dir, f'shard-{shard:05d}.npy')
+    
+    @property
+    def n_shards(self):
+        return len(self._first_ids)
+    
+    def contains(self, path):
+        """True if a flushed or pending row came from this source path"""
+        return bool(self.existing_paths([path]))
+    
+    def existing_paths(self, paths):
+        """Set of ``paths`` (made absolute) that a flushed or pending row came from; one query per 900 paths"""
+        paths = {os.path.abspath(path) for path in paths}
+        found = paths & self._pending_paths
+        remaining = list(paths - found)
+        for start in range(0, len(remaining), 900):
+            # Stay under SQLite's bound-parameter limit
+            chunk = remaining[start:start + 900]
+            found.update(path for path, in self._db.execute(
+                f"SELECT DISTINCT path FROM samples WHERE path IN ({', '.join('?' * len(chunk))})", chunk
+            ))
+        return found
+    
+    def append(self, features, label, path=None, duration=None, sample_rate=None):
+        """Queue one vector; a full block of ``shard_rows`` is written out as a new shard"""
+        features = np.asarray(features, dtype=self.dtype).ravel()
+        if self.n_features is None:
+            self.n_features = len(features)
+        elif len(features) != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {len(features)}")
+        
+        if isinstance(label, np.generic):
+            label = label.item()
+        path = os.path.abspath(path) if path is not None else None
+        self._pending.append((features, path, label, duration, sample_rate))
+        if path is not None:
+            self._pending_paths.add(path)
+        
+        if len(self._pending) >= self.shard_rows:
+            self.flush()
+    
+    def flush(self):
+        """Write pending rows as a shard, then index them"""
+        if not self._pending:
+            return
+        
+        shard = self.n_shards
+        path = self._shard_path(shard)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.stack([row[0] for row in self._pending]))
+        os.replace(tmp_path, path)
+        
+        first_id = self._n_rows
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                ('feature_version', str(FEATURE_VERSION)),
+                ('n_features', str(self.n_features)),
+                ('dtype', self.dtype.str),
+            ])
+            self._db.execute("INSERT INTO shards VALUES (?, ?, ?)", (shard, first_id, len(self._pending)))
+            self._db.executemany(
+                "INSERT INTO samples VALUES (?, ?, ?, ?, ?)",
+                [(first_id + i, path, label, duration, sample_rate)
+                 for i, (_, path, label, duration, sample_rate) in enumerate(self._pending)]
+            )
+        
+        self._first_ids.append(first_id)
+        self._n_rows += len(self._pending)
+        self._pending = []
+        self._pending_paths = set()
+    
+    def clear(self):
+        """Remove every row, pending or flushed; the store is empty afterwards"""
+        self._pending = []
+        self._pending_paths = set()
+        self._mmaps.clear()
+        with self._db:
+            self._db.execute("DELETE FROM samples")
+            self._db.execute("DELETE FROM shards")
+            self._db.execute("DELETE FROM meta")
+        for shard in range(self.n_shards):
+            if os.path.exists(self._shard_path(shard)):
+                os.remove(self._shard_path(shard))
+        self._first_ids = []
+        self._n_rows = 0
+        self.n_features = None
+    
+    def shard(self, shard):
+        """Read-only memory map of one shard's (rows, n_features) array"""
+        if shard not in self._mmaps:
+            self._mmaps[shard] = np.load(self._shard_path(shard), mmap_mode='r')
+        return self._mmaps[shard]
+    
+    def _where(self, labels=None, min_duration=None, max_duration=None, sample_rate=None, path_prefix=None):
+        """SQL WHERE clause and parameters for the ``select`` filters"""
+        clauses, params = [], []
+        if labels is not None:
+            labels = [label.item() if isinstance(label, np.generic) else label for label in labels]
+            clauses.append(f"label IN ({', '.join('?' * len(labels))})")
+            params.extend(labels)
+        if min_duration is not None:
+            clauses.append("duration >= ?")
+            params.append(min_duration)
+        if max_duration is not None:
+            clauses.append("duration <= ?")
+            params.append(max_duration)
+        if sample_rate is not None:
+            clauses.append("sample_rate = ?")
+            params.append(sample_rate)
+        if path_prefix is not None:
+            clauses.append("substr(path, 1, ?) = ?")
+            params.extend([len(os.path.abspath(path_prefix)), os.path.abspath(path_prefix)])
+        
+        return (f" WHERE {' AND '.join(clauses)}" if clauses else ''), params
+    
+    def select(self, **filters):
+        """Sorted ids of rows matching every given filter.
+        
+        Filters: ``labels`` (any of), ``min_duration``/``max_duration`` in
+        seconds, native ``sample_rate`` and ``path_prefix``.
+        """
+        where, params = self._where(**filters)
+        rows = self._db.execute(f"SELECT id FROM samples{where} ORDER BY id", params).fetchall()
+        return np.array([row[0] for row in rows], dtype=np.int64)
+    
+    def stratified_ids(self, per_label=None, fraction=None, seed=0, **filters):
+        """Random subset of the rows matching ``filters`` with the same share (or count) per label.
+        
+        ``per_label`` caps every label at that many rows; ``fraction`` keeps
+        that share of each label (at least one row). Ids come back sorted so
+        shards are read front to back.
+        """
+        where, params = self._where(**filters)
+        rows = self._db.execute(f"SELECT id, label FROM samples{where} ORDER BY id", params).fetchall()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        labels = np.array([row[1] for row in rows])
+        rng = np.random.RandomState(seed)
+        
+        chosen = []
+        for label in np.unique(labels):
+            label_ids = ids[labels == label]
+            n = len(label_ids)
+            if fraction is not None:
+                n = max(1, int(round(n * fraction)))
+            if per_label is not None:
+                n = min(n, per_label)
+            chosen.append(rng.choice(label_ids, size=n, replace=False))
+        
+        return np.sort(np.concatenate(chosen)) if chosen else ids
+    
+    def metadata(self, ids):
+        """(path, label, duration, sample_rate) tuples for the given ids, in order"""
+        rows = {}
+        ids = [int(i) for i in ids]
+        for start in range(0, len(ids), 900):
+            # Stay under SQLite's bound-parameter limit
+            chunk = ids[start:start + 900]
+            rows.update((row[0], row[1:]) for row in self._db.execute(
+                f"SELECT id, path, label, duration, sample_rate FROM samples WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ))
+        return [rows[i] for i in ids]
+    
+    def labels(self, ids=None):
+        """Labels of the given ids (all rows by default), in order"""
+        if ids is None:
+            return np.array([row[0] for row in self._db.execute("SELECT label FROM samples ORDER BY id")])
+        return np.array([label for _, label, _, _ in self.metadata(ids)])
+    
+    def load(self, ids=None):
+        """Gather (features, labels) for the given ids (all rows by default) from the shards"""
+        if ids is None:
+            ids = np.arange(self._n_rows)
+        ids = np.asarray(ids, dtype=np.int64)
+        
+        features = np.empty((len(ids), self.n_features or 0), dtype=self.dtype)
+        shard_of = np.searchsorted(self._first_ids, ids, side='right') - 1
+        for shard in np.unique(shard_of):
+            mask = shard_of == shard
+            features[mask] = self.shard(shard)[ids[mask] - self._first_ids[shard]]
+        return features, self.labels(ids)
+    
+    def iter_batches(self, ids=None, batch_size=4096):
+        """Yield (features, labels) for the given ids in batches, holding one batch in memory at a time"""
+        if ids is None:
+            ids = np.arange(self._n_rows)
+        for start in range(0, len(ids), batch_size):
+            yield self.load(ids[start:start + batch_size])
+    
+    def close(self):
+        """Flush pending rows and close the index"""
+        self.flush()
+        self._mmaps.clear()
+        self._db.close()
\ No newline at end of file
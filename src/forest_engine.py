@@ -0,0 +1,138 @@
+import numpy as np
+
+# Inference backends understood by VoiceEmotionAnalyzer:
+#   sklearn - call the fitted scikit-learn estimator
+#   native  - evaluate flattened tree arrays with NativeForest
+#   auto    - native for compact (.vem) models, sklearn for pickles
+BACKENDS = ('auto', 'sklearn', 'native')
+
+def flatten_forest(model):
+    """Flatten a fitted sklearn random forest into concatenated node arrays.
+    
+    Child indices are global (offsets into the concatenated arrays) and
+    leaves point to themselves on both sides with feature 0, so a traversal
+    can run a fixed number of steps without checking for leaves. Leaf
+    values are per-class probabilities (each node's class distribution
+    normalised to sum to one), which is what ``predict_proba`` averages.
+    """
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    sizes = [tree.node_count for tree in trees]
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    
+    feature = np.empty(offsets[-1], dtype=np.int32)
+    threshold = np.empty(offsets[-1], dtype=np.float64)
+    left = np.empty(offsets[-1], dtype=np.int32)
+    right = np.empty(offsets[-1], dtype=np.int32)
+    value = np.empty((offsets[-1], len(model.classes_)), dtype=np.float64)
+    
+    for tree, start, end in zip(trees, offsets[:-1], offsets[1:]):
+        is_leaf = tree.children_left == -1
+        own = np.arange(start, end)
+        feature[start:end] = np.where(is_leaf, 0, tree.feature)
+        threshold[start:end] = tree.threshold
+        left[start:end] = np.where(is_leaf, own, tree.children_left + start)
+        right[start:end] = np.where(is_leaf, own, tree.children_right + start)
+        
+        counts = tree.value[:, 0, :]
+        totals = counts.sum(axis=1, keepdims=True)
+        value[start:end] = counts / np.where(totals > 0, totals, 1)
+    
+    return {
+        'tree_offsets': offsets,
+        'feature': feature,
+        'threshold': threshold,
+        'left': left,
+        'right': right,
+        'value': value,
+        'classes': np.asarray(model.classes_, dtype=np.int64),
+        'max_depth': max(tree.max_depth for tree in trees),
+    }
+
+class NativeScaler:
+    """Standardisation with stored mean and scale, equivalent to StandardScaler.transform"""
+    
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+    
+    @classmethod
+    def from_sklearn(cls, scaler, n_features):
+        """Copy parameters out of a fitted StandardScaler (or None)"""
+        mean = getattr(scaler, 'mean_', None)
+        scale = getattr(scaler, 'scale_', None)
+        return cls(
+            np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64),
+            np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64),
+        )
+    
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+class NativeForest:
+    """Vectorized random forest inference over flattened tree arrays.
+    
+    All trees are traversed for all rows at once: each step is a handful of
+    NumPy gathers over an ``n_rows * n_trees`` node array, repeated
+    ``max_depth`` times. There is no per-call validation or thread-pool
+    dispatch, which is where sklearn spends most of a single-row
+    ``predict_proba``. Features are compared as float32 against the stored
+    thresholds and tree probabilities are summed in tree order, exactly as
+    sklearn does, so results are identical to the exported estimator.
+    """
+    
+    def __init__(self, arrays, n_features, max_depth):
+        self.roots = np.asarray(arrays['tree_offsets'][:-1], dtype=np.intp)
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.classes_ = np.asarray(arrays['classes'])
+        self.n_features_in_ = n_features
+        self.n_trees = len(self.roots)
+        self.max_depth = int(max_depth)
+    
+    @classmethod
+    def from_sklearn(cls, model):
+        """Build an engine from a fitted RandomForestClassifier"""
+        arrays = flatten_forest(model)
+        return cls(arrays, model.n_features_in_, arrays['max_depth'])
+    
+    def to_arrays(self):
+        """The node arrays in ``flatten_forest`` layout (trees are stored contiguously)"""
+        return {
+            'tree_offsets': np.append(self.roots, len(self.feature)).astype(np.int64),
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'value': self.value,
+            'classes': np.asarray(self.classes_, dtype=np.int64),
+            'max_depth': self.max_depth,
+        }
+    
+    def apply(self, X):
+        """Leaf index reached in every tree, shape (n_rows, n_trees)"""
+        X = np.ascontiguousarray(np.atleast_2d(X), dtype=np.float32)
+        n_rows, n_features = X.shape
+        values = X.ravel()
+        
+        # Offset of each (row, tree) pair's row in the flattened feature matrix
+        row_base = np.repeat(np.arange(n_rows, dtype=np.intp) * n_features, self.n_trees)
+        node = np.tile(self.roots, n_rows)
+        
+        for _ in range(self.max_depth):
+            go_left = values[row_base + self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        
+        return node.reshape(n_rows, self.n_trees)
+    
+    def predict_proba(self, X):
+        """Mean of per-tree leaf class probabilities for each row"""
+        leaves = self.apply(X)
+        # (n_trees, n_rows, n_classes): reducing over the leading axis adds
+        # tree by tree, matching sklearn's accumulation order
+        return self.value[leaves.T].sum(axis=0) / self.n_trees
+    
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
\ No newline at end of file
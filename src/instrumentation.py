@@ -0,0 +1,308 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+# Opt-in per-stage timing. Code under measurement wraps each stage in
+#     with stage('features.stft'):
+#         ...
+# With no sinks enabled ``stage`` returns a shared no-op context manager, so
+# the disabled cost is one function call and a tuple truth test per stage.
+# Stage names are dotted: analyzer.*, features.*, realtime.*, dataset.*.
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Enabled sinks; an empty tuple means instrumentation is off
+_sinks = ()
+
+class _NullStage:
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    __slots__ = ('name', 'started')
+    
+    def __init__(self, name):
+        self.name = name
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.started)
+        if exc_type is not None:
+            record_error(self.name, exc)
+        return False
+
+def stage(name):
+    """Context manager timing one pipeline stage; exceptions also count as stage errors"""
+    if not _sinks:
+        return _NULL_STAGE
+    return _Stage(name)
+
+def enabled():
+    return bool(_sinks)
+
+def enable(*sinks):
+    """Start sending observations to the given sinks (in addition to any already enabled)"""
+    global _sinks
+    _sinks = _sinks + tuple(sinks)
+    return sinks[0] if len(sinks) == 1 else sinks
+
+def disable():
+    """Stop instrumentation and close every sink"""
+    global _sinks
+    sinks, _sinks = _sinks, ()
+    for sink in sinks:
+        sink.close()
+
+def get_sinks():
+    return _sinks
+
+def set_sinks(sinks):
+    """Replace the enabled sinks without closing the old ones, e.g. in a forked worker"""
+    global _sinks
+    _sinks = tuple(sinks)
+
+def observe(name, seconds):
+    """Record a duration measured outside a ``stage`` block"""
+    for sink in _sinks:
+        sink.observe(name, seconds)
+
+def record_error(name, error=None):
+    """Count a failure in a stage"""
+    for sink in _sinks:
+        sink.error(name, error)
+
+def replay(events):
+    """Feed events collected by a ``CollectingSink`` (e.g. in a worker process) to the enabled sinks"""
+    for kind, name, value in events:
+        if kind == 'observe':
+            observe(name, value)
+        else:
+            record_error(name, value)
+
+def _describe(error):
+    """Error as a string; replayed errors from other processes already are one"""
+    if error is None or isinstance(error, str):
+        return error
+    return repr(error)
+
+class Histogram:
+    """Cumulative-bucket duration histogram"""
+    
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+    
+    def add(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+    
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (the observed max for the overflow bucket)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+class MetricsRegistry:
+    """In-process sink: one histogram and one error counter per stage"""
+    
+    def __init__(self):
+        self.histograms = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+    
+    def error(self, name, error=None):
+        with self._lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+    
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.errors.clear()
+    
+    def snapshot(self):
+        """Per-stage count, total, mean, p50/p99 (bucket bounds) and max, plus error counts"""
+        with self._lock:
+            stages = {}
+            for name, h in sorted(self.histograms.items()):
+                stages[name] = {
+                    'count': h.count,
+                    'total_ms': round(h.sum * 1000, 3),
+                    'mean_ms': round(h.sum / h.count * 1000, 3),
+                    'p50_ms': round(h.quantile(0.5) * 1000, 3),
+                    'p99_ms': round(h.quantile(0.99) * 1000, 3),
+                    'max_ms': round(h.max * 1000, 3),
+                }
+            return {'stages': stages, 'errors': dict(sorted(self.errors.items()))}
+    
+    def prometheus_text(self, prefix='voice_emotion'):
+        """Render the registry in the Prometheus text exposition format"""
+        lines = [
+            f'# HELP {prefix}_stage_seconds Duration of pipeline stages',
+            f'# TYPE {prefix}_stage_seconds histogram',
+        ]
+        with self._lock:
+            for name, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, h.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {h.count}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {h.sum:.9f}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {h.count}')
+            
+            lines.append(f'# HELP {prefix}_stage_errors_total Failures per pipeline stage')
+            lines.append(f'# TYPE {prefix}_stage_errors_total counter')
+            for name, count in sorted(self.errors.items()):
+                lines.append(f'{prefix}_stage_errors_total{{stage="{name}"}} {count}')
+        return '\n'.join(lines) + '\n'
+    
+    def close(self):
+        pass
+
+class PrometheusTextSink(MetricsRegistry):
+    """Registry that rewrites a Prometheus text file every ``interval`` seconds and on close.
+    
+    The file is replaced atomically, so it can be scraped by node_exporter's
+    textfile collector (or just read) while the process runs. A failed write
+    is counted in ``write_errors`` and reported once on stderr; it never
+    fails the stage being measured.
+    """
+    
+    def __init__(self, path, interval=10.0):
+        super().__init__()
+        self.path = path
+        self.interval = interval
+        self.write_errors = 0
+        self._next_write = time.monotonic() + interval
+        self._write_lock = threading.Lock()
+    
+    def observe(self, name, seconds):
+        super().observe(name, seconds)
+        # Threads that find a write already in progress skip it rather than wait
+        if time.monotonic() >= self._next_write and self._write_lock.acquire(blocking=False):
+            try:
+                self._write()
+            finally:
+                self._write_lock.release()
+    
+    def write(self):
+        with self._write_lock:
+            self._write()
+    
+    def _write(self):
+        self._next_write = time.monotonic() + self.interval
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + '.',
+                                            suffix='.tmp', dir=os.path.dirname(self.path) or '.')
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.prometheus_text())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.write_errors += 1
+            if self.write_errors == 1:
+                sys.stderr.write(f"Could not write metrics to {self.path}: {e}\n")
+            if tmp_path is not None and os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+    
+    def close(self):
+        self.write()
+
+class JSONLSink:
+    """Append one JSON line per observation or error to a file or text stream"""
+    
+    def __init__(self, target):
+        self._owns_file = isinstance(target, (str, os.PathLike))
+        self._fp = open(target, 'a') if self._owns_file else target
+        self._lock = threading.Lock()
+    
+    def _write(self, record):
+        line = json.dumps(record) + '\n'
+        with self._lock:
+            self._fp.write(line)
+    
+    def observe(self, name, seconds):
+        self._write({'ts': round(time.time(), 6), 'stage': name, 'seconds': seconds})
+    
+    def error(self, name, error=None):
+        self._write({'ts': round(time.time(), 6), 'stage': name, 'error': _describe(error)})
+    
+    def close(self):
+        with self._lock:
+            if self._owns_file:
+                self._fp.close()
+            else:
+                self._fp.flush()
+
+class CollectingSink:
+    """Buffer raw events so another process can ``replay`` them"""
+    
+    def __init__(self):
+        self.events = []
+    
+    def observe(self, name, seconds):
+        self.events.append(('observe', name, seconds))
+    
+    def error(self, name, error=None):
+        self.events.append(('error', name, _describe(error)))
+    
+    def drain(self):
+        events, self.events = self.events, []
+        return events
+    
+    def close(self):
+        pass
+
+def sink_for_path(path):
+    """Choose a sink for a --metrics argument.
+    
+    ``*.jsonl`` logs every event, ``-`` dumps Prometheus text to stderr on
+    close, and any other path is rewritten as a Prometheus text file.
+    """
+    if path == '-':
+        return _StderrPrometheusSink()
+    if path.endswith('.jsonl'):
+        return JSONLSink(path)
+    return PrometheusTextSink(path)
+
+class _StderrPrometheusSink(MetricsRegistry):
+    def close(self):
+        sys.stderr.write(self.prometheus_text())
\ No newline at end of file
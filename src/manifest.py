@@ -0,0 +1,148 @@
+import glob
+import hashlib
+import json
+import os
+import re
+from .feature_store import FeatureStore
+
+# Manifest-driven dataset processing for several machines sharing a filesystem:
+#   1. write_manifest scans data_dir/<emotion>/ once into a JSON-lines manifest
+#   2. each node runs DataProcessor.process_manifest_shard for its own k/N;
+#      shards are every N-th manifest entry, so emotions and file sizes spread
+#      evenly, and each writes a FeatureStore plus a completion marker
+#   3. merge_parts checks that all N markers agree and combines the part stores
+# No coordination happens outside the files themselves.
+
+MANIFEST_VERSION = 1
+
+_MARKER_PATTERN = re.compile(r'part-(\d+)-of-(\d+)\.done\.json$')
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def write_manifest(files, data_dir, manifest_path):
+    """Write (audio_path, label) pairs as a manifest with paths relative to ``data_dir``"""
+    data_dir = os.path.abspath(data_dir)
+    lines = [json.dumps({'manifest_version': MANIFEST_VERSION, 'data_dir': data_dir, 'files': len(files)})]
+    lines.extend(
+        json.dumps({'path': os.path.relpath(os.path.abspath(path), data_dir), 'label': label})
+        for path, label in files
+    )
+    _write_atomic(manifest_path, '\n'.join(lines) + '\n')
+
+def read_manifest(manifest_path, data_root=None):
+    """Return ((audio_path, label) pairs, manifest id) for a manifest.
+    
+    Paths are resolved against ``data_root`` when given (the dataset is
+    mounted elsewhere on this node), otherwise against the directory the
+    manifest was written from. The id is a hash of the manifest's bytes,
+    used to check that all parts come from the same manifest.
+    """
+    with open(manifest_path, 'rb') as f:
+        content = f.read()
+    
+    lines = content.decode().splitlines()
+    header = json.loads(lines[0])
+    if header.get('manifest_version') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version in {manifest_path}: {header.get('manifest_version')}")
+    
+    root = data_root or header['data_dir']
+    files = []
+    for line in lines[1:]:
+        entry = json.loads(line)
+        files.append((os.path.join(root, entry['path']), entry['label']))
+    if len(files) != header['files']:
+        raise ValueError(f"Manifest {manifest_path} is truncated: {len(files)} of {header['files']} entries")
+    
+    return files, hashlib.blake2b(content, digest_size=16).hexdigest()
+
+def parse_shard(spec):
+    """Parse a ``k/N`` shard spec (k counts from 0) into (k, N)"""
+    match = re.fullmatch(r'(\d+)/(\d+)', spec.strip())
+    if not match:
+        raise ValueError(f"Shard must look like k/N, got: {spec}")
+    shard_index, num_shards = int(match.group(1)), int(match.group(2))
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"Shard index must be in 0..{num_shards - 1}, got {shard_index}")
+    return shard_index, num_shards
+
+def manifest_shard(files, shard_index, num_shards):
+    """Every ``num_shards``-th manifest entry, starting at ``shard_index``"""
+    return files[shard_index::num_shards]
+
+def part_store_path(parts_dir, shard_index, num_shards):
+    return os.path.join(parts_dir, f'part-{shard_index:05d}-of-{num_shards:05d}')
+
+def write_part_marker(parts_dir, shard_index, num_shards, manifest_id, files, rows):
+    """Record that a shard finished; ``rows`` short of ``files`` are files that failed extraction"""
+    marker = {
+        'shard': shard_index,
+        'num_shards': num_shards,
+        'manifest_id': manifest_id,
+        'files': files,
+        'rows': rows,
+    }
+    _write_atomic(part_store_path(parts_dir, shard_index, num_shards) + '.done.json', json.dumps(marker))
+    return marker
+
+def read_part_markers(parts_dir):
+    """Completion markers found in ``parts_dir``, ordered by shard"""
+    markers = []
+    for path in glob.glob(os.path.join(parts_dir, 'part-*-of-*.done.json')):
+        if _MARKER_PATTERN.search(path):
+            with open(path) as f:
+                markers.append(json.load(f))
+    return sorted(markers, key=lambda marker: marker['shard'])
+
+def merge_parts(parts_dir, output_store, allow_partial=False, batch_size=4096):
+    """Append every completed part store under ``parts_dir`` to the ``output_store`` directory.
+    
+    All markers must come from the same manifest and shard count, and
+    every shard must be done unless ``allow_partial``. Rows whose source
+    file is already in the output are skipped, so a merge can be re-run.
+    Returns a summary dict.
+    """
+    markers = read_part_markers(parts_dir)
+    if not markers:
+        raise ValueError(f"No completed parts in {parts_dir}")
+    
+    num_shards = {marker['num_shards'] for marker in markers}
+    manifest_ids = {marker['manifest_id'] for marker in markers}
+    if len(num_shards) > 1 or len(manifest_ids) > 1:
+        raise ValueError(f"Parts in {parts_dir} come from different manifests or shard counts")
+    num_shards = num_shards.pop()
+    
+    missing = sorted(set(range(num_shards)) - {marker['shard'] for marker in markers})
+    if missing and not allow_partial:
+        raise ValueError(f"Shards not finished: {', '.join(map(str, missing))} (of {num_shards})")
+    
+    appended = 0
+    with FeatureStore(output_store) as output:
+        for marker in markers:
+            with FeatureStore(part_store_path(parts_dir, marker['shard'], num_shards)) as part:
+                for start in range(0, len(part), batch_size):
+                    ids = range(start, min(start + batch_size, len(part)))
+                    features, _ = part.load(ids)
+                    metadata = part.metadata(ids)
+                    known = output.existing_paths(path for path, _, _, _ in metadata if path is not None)
+                    for feature_vector, (path, label, duration, sample_rate) in zip(features, metadata):
+                        if path is not None and path in known:
+                            continue
+                        output.append(feature_vector, label, path=path, duration=duration, sample_rate=sample_rate)
+                        if path is not None:
+                            known.add(path)
+                        appended += 1
+    rows = len(output)
+    
+    return {
+        'parts': len(markers),
+        'num_shards': num_shards,
+        'missing_shards': missing,
+        'files': sum(marker['files'] for marker in markers),
+        'failed': sum(marker['files'] - marker['rows'] for marker in markers),
+        'appended': appended,
+        'rows': rows,
+    }
\ No newline at end of file
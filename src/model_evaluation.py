@@ -0,0 +1,120 @@
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import numpy as np
+from .voice_emotion import VoiceEmotionAnalyzer, _holdout_split
+from .model_types import MODEL_TYPES, supports_native
+from .model_format import COMPACT_MODEL_EXTENSION
+
+# Deployment cost of a saved model next to its accuracy. Latencies cover
+# scaling plus the model's predict_proba on ready feature vectors (the part
+# that changes between model types); feature extraction costs the same for
+# all of them and is not included.
+
+def _percentile_ms(seconds, q):
+    return float(np.percentile(np.asarray(seconds) * 1000, q))
+
+def measure_saved_model(model_path, X_test, y_test, backend='auto', batch_size=64, repeats=200, loads=5):
+    """Size, load time, held-out accuracy and inference latency of a saved model.
+    
+    Single-row latency is timed over ``repeats`` calls with one row each;
+    batch latency over ``repeats // 10`` (at least 3) calls with
+    ``batch_size`` rows. Returns a dict of plain numbers.
+    """
+    load_seconds = []
+    for _ in range(loads):
+        started = time.perf_counter()
+        analyzer = VoiceEmotionAnalyzer(model_path, backend=backend)
+        load_seconds.append(time.perf_counter() - started)
+    
+    X_test = np.asarray(X_test)
+    rows = X_test if len(X_test) else np.zeros((1, analyzer.model.n_features_in_))
+    
+    # Warm up once so lazy imports and first-call allocations are not timed
+    analyzer.predict_from_features(rows[:1])
+    single = []
+    for i in range(repeats):
+        row = rows[i % len(rows):i % len(rows) + 1]
+        started = time.perf_counter()
+        analyzer.predict_from_features(row)
+        single.append(time.perf_counter() - started)
+    
+    batch = np.resize(rows, (batch_size, rows.shape[1]))
+    batched = []
+    for _ in range(max(3, repeats // 10)):
+        started = time.perf_counter()
+        analyzer.predict_from_features(batch)
+        batched.append(time.perf_counter() - started)
+    
+    return {
+        'backend': analyzer.backend,
+        'size_bytes': os.path.getsize(model_path),
+        'load_ms': statistics.median(load_seconds) * 1000,
+        'holdout_accuracy': analyzer._accuracy(X_test, y_test),
+        'single_p50_ms': _percentile_ms(single, 50),
+        'single_p99_ms': _percentile_ms(single, 99),
+        'batch_size': batch_size,
+        'batch_ms': statistics.median(batched) * 1000,
+    }
+
+def compare_model_types(X, y, model_types=None, holdout=0.2, n_jobs=-1, n_estimators=100, batch_size=64,
+                        repeats=200, models_dir=None):
+    """Train every model type on the same split and measure what each would cost to deploy.
+    
+    Each model is saved as a pickle, and forests also as ``.vem`` (run on
+    the native engine), then reloaded from disk and measured with
+    ``measure_saved_model``. Models are written to ``models_dir`` if given,
+    otherwise to a temporary directory that is removed afterwards. Returns
+    one row per (model type, file format).
+    """
+    model_types = model_types or list(MODEL_TYPES)
+    X_train, X_test, y_train, y_test = _holdout_split(X, y, holdout)
+    
+    work_dir = models_dir or tempfile.mkdtemp(prefix='model-compare-')
+    os.makedirs(work_dir, exist_ok=True)
+    rows = []
+    try:
+        for model_type in model_types:
+            analyzer = VoiceEmotionAnalyzer()
+            analyzer.train_model(X_train, y_train, n_jobs=n_jobs, n_estimators=n_estimators, model_type=model_type)
+            
+            formats = [('.pkl', 'sklearn')]
+            if supports_native(analyzer.model):
+                formats.append((COMPACT_MODEL_EXTENSION, 'native'))
+            
+            for extension, backend in formats:
+                path = os.path.join(work_dir, model_type + extension)
+                analyzer.save_model(path)
+                row = {
+                    'model_type': model_type,
+                    'format': extension.lstrip('.'),
+                    'n_train': analyzer.training_report['n_train'],
+                    'n_holdout': int(len(y_test)),
+                    'fit_seconds': analyzer.training_report['fit_seconds'],
+                }
+                row.update(measure_saved_model(path, X_test, y_test, backend=backend, batch_size=batch_size,
+                                               repeats=repeats))
+                rows.append(row)
+    finally:
+        if models_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    return rows
+
+def recommend(rows, latency_budget_ms=None, max_size_bytes=None):
+    """Most accurate row whose single-row p99 latency and file size fit the budgets, or None.
+    
+    Ties on accuracy go to the faster model. Rows without a held-out
+    accuracy are never recommended.
+    """
+    candidates = [
+        row for row in rows
+        if row['holdout_accuracy'] is not None
+        and (latency_budget_ms is None or row['single_p99_ms'] <= latency_budget_ms)
+        and (max_size_bytes is None or row['size_bytes'] <= max_size_bytes)
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda row: (row['holdout_accuracy'], -row['single_p99_ms']))
\ No newline at end of file
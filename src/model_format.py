@@ -0,0 +1,150 @@
+import json
+import struct
+import numpy as np
+from .forest_engine import flatten_forest, NativeForest, NativeScaler
+from .model_types import model_type_of, supports_native
+
+# Compact model file layout (all little-endian):
+#   8 bytes   magic b'VEMODEL\0'
+#   4 bytes   format version (uint32)
+#   4 bytes   header length in bytes (uint32)
+#   N bytes   JSON header: metadata plus {name: {dtype, shape, offset}} per array
+#   ...       array data, each array starting on a 64-byte boundary
+# Arrays are read through a single read-only memory map, so loading costs a
+# few page faults instead of unpickling every tree node object by object,
+# and worker processes scoring with the same file share its pages.
+MAGIC = b'VEMODEL\0'
+COMPACT_MODEL_EXTENSION = '.vem'
+FORMAT_VERSION = 2
+ALIGNMENT = 64
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def is_compact_model(path):
+    """Return True if the file starts with the compact model magic"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def save_compact_model(path, model, scaler, emotions, metadata=None):
+    """Write a fitted forest (scikit-learn or ``NativeForest``) and scaler in the compact memory-mappable format"""
+    if not supports_native(model):
+        raise ValueError(f"Only forests can be saved in the compact format, not {model_type_of(model)}")
+    n_features = model.n_features_in_
+    arrays = model.to_arrays() if isinstance(model, NativeForest) else flatten_forest(model)
+    max_depth = arrays.pop('max_depth')
+    native_scaler = NativeScaler.from_sklearn(scaler, n_features)
+    arrays['scaler_mean'] = native_scaler.mean_
+    arrays['scaler_scale'] = native_scaler.scale_
+    
+    header = {
+        'model_type': 'random_forest',
+        'n_features': int(n_features),
+        'n_trees': len(arrays['tree_offsets']) - 1,
+        'max_depth': int(max_depth),
+        'emotions': list(emotions),
+        'has_scaler': scaler is not None,
+        'metadata': metadata or {},
+        'arrays': {},
+    }
+    
+    # Offsets are relative to the aligned start of the data section
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        header['arrays'][name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset,
+        }
+        offset = _align(offset + array.nbytes)
+    
+    header_bytes = json.dumps(header).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header_bytes))
+    
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<II', FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * (data_start - f.tell()))
+        for name, array in arrays.items():
+            f.write(b'\0' * (data_start + header['arrays'][name]['offset'] - f.tell()))
+            f.write(array.tobytes())
+
+def read_header(path):
+    """Read and validate the header of a compact model file"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a compact model file: {path}")
+        version, header_len = struct.unpack('<II', f.read(8))
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact model version {version} (max {FORMAT_VERSION})")
+        header = json.loads(f.read(header_len))
+    header['format_version'] = version
+    header['data_start'] = _align(len(MAGIC) + 8 + header_len)
+    return header
+
+def load_compact_model(path, mmap=True):
+    """Load a compact model file; returns (header, arrays).
+    
+    With ``mmap=True`` every array is a read-only view of one memory map of
+    the file; otherwise the file is read into memory once.
+    """
+    header = read_header(path)
+    if mmap:
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        with open(path, 'rb') as f:
+            buffer = np.frombuffer(f.read(), dtype=np.uint8)
+    
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        start = header['data_start'] + spec['offset']
+        count = int(np.prod(spec['shape'])) * dtype.itemsize
+        arrays[name] = buffer[start:start + count].view(dtype).reshape(spec['shape'])
+    return header, arrays
+
+def _upgrade_v1_arrays(arrays):
+    """Version 1 files mark leaves with -1 children; rewrite them as self-loops.
+    
+    Returns in-memory copies of the node arrays and the forest's maximum depth,
+    which version 1 headers do not record.
+    """
+    arrays = dict(arrays)
+    is_leaf = arrays['left'] == -1
+    own = np.arange(len(is_leaf), dtype=np.int32)
+    arrays['feature'] = np.where(is_leaf, 0, arrays['feature']).astype(np.int32)
+    arrays['left'] = np.where(is_leaf, own, arrays['left']).astype(np.int32)
+    arrays['right'] = np.where(is_leaf, own, arrays['right']).astype(np.int32)
+    
+    # Walk all trees level by level to find the deepest leaf
+    max_depth = 0
+    frontier = np.asarray(arrays['tree_offsets'][:-1], dtype=np.intp)
+    while True:
+        frontier = frontier[~is_leaf[frontier]]
+        if len(frontier) == 0:
+            return arrays, max_depth
+        frontier = np.concatenate([arrays['left'][frontier], arrays['right'][frontier]])
+        max_depth += 1
+
+def convert_pickle_model(pickle_path, output_path):
+    """Convert a pickled VoiceEmotionAnalyzer model to the compact format"""
+    import pickle
+    with open(pickle_path, 'rb') as f:
+        model_data = pickle.load(f)
+    save_compact_model(output_path, model_data['model'], model_data['scaler'], model_data['emotions'])
+
+def load_model_file(path, mmap=True):
+    """Load a compact model file into (model, scaler, emotions)"""
+    header, arrays = load_compact_model(path, mmap=mmap)
+    if header['model_type'] != 'random_forest':
+        raise ValueError(f"Unsupported model type: {header['model_type']}")
+    
+    if header['format_version'] < 2:
+        arrays, header['max_depth'] = _upgrade_v1_arrays(arrays)
+    
+    model = NativeForest(arrays, header['n_features'], header['max_depth'])
+    scaler = NativeScaler(arrays['scaler_mean'], arrays['scaler_scale']) if header['has_scaler'] else None
+    return model, scaler, header['emotions']
\ No newline at end of file
@@ -0,0 +1,68 @@
+# Classifier families VoiceEmotionAnalyzer.train_model can fit. Each entry
+# builds an unfitted scikit-learn estimator with predict_proba and classes_;
+# ``parallel_fit`` marks the ones whose fit takes an ``n_jobs`` argument and
+# ``native`` the tree ensembles that the native engine and the .vem format
+# can run (they average per-tree class probabilities like a random forest).
+
+DEFAULT_MODEL_TYPE = 'random_forest'
+
+def _random_forest(n_estimators=100, n_jobs=None):
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(n_estimators=n_estimators, random_state=42, n_jobs=n_jobs)
+
+def _extra_trees(n_estimators=100, n_jobs=None):
+    from sklearn.ensemble import ExtraTreesClassifier
+    return ExtraTreesClassifier(n_estimators=n_estimators, random_state=42, n_jobs=n_jobs)
+
+def _hist_gradient_boosting(n_estimators=100, n_jobs=None):
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    return HistGradientBoostingClassifier(max_iter=n_estimators, random_state=42)
+
+def _logistic_regression(n_estimators=100, n_jobs=None):
+    from sklearn.linear_model import LogisticRegression
+    return LogisticRegression(max_iter=1000)
+
+def _mlp(n_estimators=100, n_jobs=None):
+    from sklearn.neural_network import MLPClassifier
+    return MLPClassifier(hidden_layer_sizes=(32,), max_iter=1000, random_state=42)
+
+MODEL_TYPES = {
+    'random_forest': {'factory': _random_forest, 'parallel_fit': True, 'native': True,
+                      'description': 'Random forest (n_estimators trees)'},
+    'extra_trees': {'factory': _extra_trees, 'parallel_fit': True, 'native': True,
+                    'description': 'Extremely randomized trees (n_estimators trees)'},
+    'hist_gradient_boosting': {'factory': _hist_gradient_boosting, 'parallel_fit': False, 'native': False,
+                               'description': 'Histogram gradient boosting (n_estimators boosting rounds)'},
+    'logistic_regression': {'factory': _logistic_regression, 'parallel_fit': False, 'native': False,
+                            'description': 'Multinomial logistic regression'},
+    'mlp': {'factory': _mlp, 'parallel_fit': False, 'native': False,
+            'description': 'Multi-layer perceptron with one hidden layer of 32 units'},
+}
+
+def register_model_type(name, factory, parallel_fit=False, description=''):
+    """Add a classifier family; ``factory(n_estimators, n_jobs)`` returns an unfitted estimator"""
+    MODEL_TYPES[name] = {'factory': factory, 'parallel_fit': parallel_fit, 'native': False,
+                         'description': description}
+
+def make_model(model_type, n_estimators=100, n_jobs=None):
+    """Unfitted estimator for a registered model type"""
+    if model_type not in MODEL_TYPES:
+        raise ValueError(f"Unknown model type: {model_type} (expected one of {', '.join(MODEL_TYPES)})")
+    spec = MODEL_TYPES[model_type]
+    return spec['factory'](n_estimators=n_estimators, n_jobs=n_jobs if spec['parallel_fit'] else None)
+
+def model_type_of(model):
+    """Registered name for a fitted estimator's family, or its class name"""
+    names = {
+        'RandomForestClassifier': 'random_forest',
+        'ExtraTreesClassifier': 'extra_trees',
+        'HistGradientBoostingClassifier': 'hist_gradient_boosting',
+        'LogisticRegression': 'logistic_regression',
+        'MLPClassifier': 'mlp',
+        'NativeForest': 'random_forest',
+    }
+    return names.get(type(model).__name__, type(model).__name__)
+
+def supports_native(model):
+    """Whether a fitted model can run on the native engine and be saved as .vem"""
+    return MODEL_TYPES.get(model_type_of(model), {}).get('native', False)
\ No newline at end of file
@@ -0,0 +1,345 @@
+import copy
+import threading
+import time
+from collections import deque
+import numpy as np
+from .voice_emotion import VoiceEmotionAnalyzer
+from .ring_buffer import RingBuffer
+from .instrumentation import stage, observe
+
+# What a stream does with a new window when it already has ``queue_size`` waiting:
+#   drop_oldest - discard its oldest pending window (live audio keeps arriving anyway)
+#   block       - make ``feed`` wait for the next tick, so replays faster than
+#                 real time lose nothing
+# ``run`` picks drop_oldest for live sources and block for unpaced replays
+# unless the detector was given a policy.
+OVERLOAD_POLICIES = ('drop_oldest', 'block')
+
+class StreamState:
+    """Buffer, pending windows and counters of one stream in a ``MultiStreamDetector``"""
+    
+    def __init__(self, name, window_size, hop_size, queue_size, vad=None, overload_policy='drop_oldest'):
+        self.name = name
+        # Room for one window plus the hop-sized slices ``feed`` writes
+        self.buffer = RingBuffer(window_size + hop_size)
+        self.window_start = 0
+        # Cut windows waiting for the next tick; when full the oldest is dropped or feed blocks
+        self.pending = deque()
+        self.queue_size = queue_size
+        self.overload_policy = overload_policy
+        self.vad = vad
+        self.lock = threading.Lock()
+        # Signalled when a tick takes this stream's pending windows
+        self.drained = threading.Condition(self.lock)
+        
+        self.samples_received = 0
+        self.windows_captured = 0
+        self.windows_processed = 0
+        # Windows whose feature extraction failed; they produce no segment
+        self.windows_failed = 0
+        self.windows_dropped = 0
+        self.windows_silent = 0
+        self.last_result = None
+        # Window-ready-to-result latency of recent windows, in seconds
+        self.latencies = deque(maxlen=1000)
+
+class MultiStreamDetector:
+    """Real-time emotion detection for many concurrent streams with one model.
+    
+    Each stream keeps its own ring buffer, window offset, optional voice
+    activity gate and counters. ``feed`` (safe to call from any thread)
+    buffers samples and cuts complete windows; each ``tick`` gathers the
+    ready windows of every stream, extracts their features and scores
+    them with a single ``predict_from_features`` call, so the forest cost
+    is paid per batch rather than per window. ``run`` drives a set of
+    ``AudioSource`` objects, one reader thread each, and ticks whenever
+    windows are ready; windows that arrive while a tick is running form
+    the next batch. Features of a batch's windows (all the same length)
+    are extracted together with ``FeatureExtractor.extract_batch``.
+    
+    ``overload_policy`` (see ``OVERLOAD_POLICIES``) applies to every
+    stream; left as None, ``add_stream`` uses drop_oldest and ``run``
+    chooses per source: drop_oldest when it is live, block otherwise.
+    
+    Results go to ``on_result(stream_name, segment)``, where ``segment``
+    has ``start``/``end`` in seconds, ``emotion`` and ``confidence``.
+    """
+    
+    def __init__(self, model_path, sample_rate=22050, window_seconds=2.0, hop_seconds=1.0, max_batch=64,
+                 queue_size=4, backend='auto', vad=None, on_result=None, overload_policy=None):
+        self.analyzer = VoiceEmotionAnalyzer(model_path, backend=backend)
+        self.sample_rate = sample_rate
+        self.window_size = int(sample_rate * window_seconds)
+        self.hop_size = int(sample_rate * hop_seconds)
+        if not 0 < self.hop_size <= self.window_size:
+            raise ValueError("hop_seconds must be positive and no longer than window_seconds")
+        self.max_batch = max_batch
+        self.queue_size = queue_size
+        if overload_policy is not None and overload_policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"overload_policy must be one of {OVERLOAD_POLICIES}")
+        self.overload_policy = overload_policy
+        # Template gate; every stream gets its own copy so hangover state is per stream
+        self.vad = vad
+        self.on_result = on_result or _print_result
+        
+        self.streams = {}
+        self._streams_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._running = False
+        # Set while run() shuts down so blocked feeds give up waiting
+        self._stopping = False
+        
+        self.ticks = 0
+        self.batches = 0
+        self.batch_sizes = deque(maxlen=1000)
+        self.latencies = deque(maxlen=10000)
+        self.elapsed = 0.0
+    
+    def add_stream(self, name, overload_policy=None):
+        """Register a stream; returns its ``StreamState``.
+        
+        ``overload_policy`` defaults to the detector's, or drop_oldest. With
+        block, ``feed`` waits for a tick, so the stream must be fed from
+        another thread than the one calling ``tick``.
+        """
+        overload_policy = overload_policy or self.overload_policy or 'drop_oldest'
+        if overload_policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"overload_policy must be one of {OVERLOAD_POLICIES}")
+        vad = copy.deepcopy(self.vad) if self.vad is not None else None
+        if vad is not None:
+            vad.reset()
+        with self._streams_lock:
+            if name in self.streams:
+                raise ValueError(f"Stream already exists: {name}")
+            state = self.streams[name] = StreamState(name, self.window_size, self.hop_size, self.queue_size, vad,
+                                                     overload_policy)
+        return state
+    
+    def remove_stream(self, name):
+        """Forget a stream, discarding any windows it has pending"""
+        with self._streams_lock:
+            return self.streams.pop(name, None)
+    
+    def feed(self, name, audio_data):
+        """Buffer samples for a stream and queue each complete window for the next tick"""
+        state = self.streams[name]
+        ready = False
+        
+        with state.lock:
+            state.samples_received += len(audio_data)
+            for offset in range(0, len(audio_data), self.hop_size):
+                dropped = state.buffer.write(audio_data[offset:offset + self.hop_size])
+                state.window_start += dropped
+                
+                while len(state.buffer) >= self.window_size:
+                    window = state.buffer.peek(self.window_size)
+                    if state.vad is None or state.vad.is_speech(window, self.sample_rate, advance=self.hop_size):
+                        if state.overload_policy == 'block':
+                            while len(state.pending) >= state.queue_size and not self._stopping:
+                                # Wake the ticking thread, then wait for it to take this stream's windows
+                                self._ready.set()
+                                state.drained.wait(timeout=0.1)
+                        if len(state.pending) >= state.queue_size:
+                            state.pending.popleft()
+                            state.windows_dropped += 1
+                        state.pending.append((state.window_start, window.copy(), time.perf_counter()))
+                        state.windows_captured += 1
+                        ready = True
+                    else:
+                        state.windows_silent += 1
+                    state.buffer.consume(self.hop_size)
+                    state.window_start += self.hop_size
+        
+        if ready:
+            self._ready.set()
+    
+    def _gather(self):
+        """Take every pending window from every stream, oldest first within each stream"""
+        with self._streams_lock:
+            states = list(self.streams.values())
+        
+        windows = []
+        for state in states:
+            with state.lock:
+                while state.pending:
+                    windows.append((state,) + state.pending.popleft())
+                state.drained.notify_all()
+        return windows
+    
+    def tick(self):
+        """Score all ready windows in batches of ``max_batch``; returns how many were scored"""
+        windows = self._gather()
+        if not windows:
+            return 0
+        
+        self.ticks += 1
+        with stage('multistream.tick'):
+            for offset in range(0, len(windows), self.max_batch):
+                self._score(windows[offset:offset + self.max_batch])
+        return len(windows)
+    
+    def _score(self, batch):
+        """Extract features for a batch of windows and classify them in one call"""
+        started = time.perf_counter()
+        for _, _, _, captured_at in batch:
+            observe('multistream.queue_wait', started - captured_at)
+        
+        with stage('multistream.features'):
+            features = self.analyzer.extract_features_batch([window for _, _, window, _ in batch], sr=self.sample_rate)
+        scored = [(item, vector) for item, vector in zip(batch, features) if vector is not None]
+        
+        results = self.analyzer.predict_from_features(np.vstack([vector for _, vector in scored])) if scored else []
+        finished = time.perf_counter()
+        
+        self.batches += 1
+        self.batch_sizes.append(len(batch))
+        for ((state, start, window, captured_at), _), result in zip(scored, results):
+            segment = {
+                'start': round(start / self.sample_rate, 3),
+                'end': round((start + len(window)) / self.sample_rate, 3),
+                'emotion': result['emotion'],
+                'confidence': float(result['confidence']),
+            }
+            latency = finished - captured_at
+            state.latencies.append(latency)
+            self.latencies.append(latency)
+            state.last_result = segment
+            state.windows_processed += 1
+            self.on_result(state.name, segment)
+        for (state, _, _, _), vector in zip(batch, features):
+            if vector is None:
+                state.windows_failed += 1
+    
+    def run(self, sources):
+        """Detect emotions on ``{name: AudioSource}`` until every source ends or Ctrl+C"""
+        for name, source in sources.items():
+            if source.sample_rate != self.sample_rate:
+                raise ValueError(f"Source {name} sample rate {source.sample_rate} does not match {self.sample_rate}")
+            policy = self.overload_policy or ('drop_oldest' if source.live else 'block')
+            self.add_stream(name, overload_policy=policy)
+        
+        # Warm up librosa's JIT-compiled kernels so the first tick is not a latency outlier
+        warmup = 0.1 * np.sin(np.arange(self.window_size, dtype=np.float32) * 0.1)
+        self.analyzer.extract_features_batch([warmup], sr=self.sample_rate)
+        
+        self._running = True
+        self._stopping = False
+        readers = [
+            threading.Thread(target=self._read_source, args=(name, source), daemon=True)
+            for name, source in sources.items()
+        ]
+        print(f"Starting multi-stream emotion detection ({len(readers)} streams)...")
+        print("Press Ctrl+C to stop")
+        
+        started = time.perf_counter()
+        for reader in readers:
+            reader.start()
+        try:
+            while True:
+                self._ready.wait(timeout=0.1)
+                self._ready.clear()
+                self.tick()
+                if not any(reader.is_alive() for reader in readers):
+                    # Sources are done; score whatever they left behind
+                    self.tick()
+                    break
+                    
+        except KeyboardInterrupt:
+            print("\nStopping emotion detection...")
+            
+        finally:
+            self._running = False
+            self._stopping = True
+            for reader in readers:
+                reader.join(timeout=1.0)
+            for source in sources.values():
+                source.close()
+            self.elapsed = time.perf_counter() - started
+            self.print_stats()
+    
+    def _read_source(self, name, source):
+        """Reader thread: pull chunks from one source into its stream"""
+        chunks = source.chunks()
+        try:
+            for audio_data in chunks:
+                self.feed(name, audio_data)
+                if not self._running:
+                    break
+        finally:
+            chunks.close()
+    
+    def get_stats(self):
+        """Per-stream and aggregate window counters and latency percentiles"""
+        with self._streams_lock:
+            states = list(self.streams.values())
+        
+        streams = {}
+        for state in states:
+            streams[state.name] = dict(
+                windows_captured=state.windows_captured,
+                windows_processed=state.windows_processed,
+                windows_failed=state.windows_failed,
+                windows_dropped=state.windows_dropped,
+                windows_silent=state.windows_silent,
+                audio_seconds=state.samples_received / self.sample_rate,
+                **_latency_stats(state.latencies)
+            )
+        
+        audio_seconds = sum(stats['audio_seconds'] for stats in streams.values())
+        batch_sizes = np.array(self.batch_sizes)
+        aggregate = dict(
+            streams=len(streams),
+            windows_captured=sum(stats['windows_captured'] for stats in streams.values()),
+            windows_processed=sum(stats['windows_processed'] for stats in streams.values()),
+            windows_failed=sum(stats['windows_failed'] for stats in streams.values()),
+            windows_dropped=sum(stats['windows_dropped'] for stats in streams.values()),
+            windows_silent=sum(stats['windows_silent'] for stats in streams.values()),
+            ticks=self.ticks,
+            batches=self.batches,
+            mean_batch_size=float(batch_sizes.mean()) if len(batch_sizes) else None,
+            max_batch_size=int(batch_sizes.max()) if len(batch_sizes) else None,
+            audio_seconds=audio_seconds,
+            realtime_factor=audio_seconds / self.elapsed if self.elapsed else None,
+            **_latency_stats(self.latencies)
+        )
+        return {'aggregate': aggregate, 'streams': streams}
+    
+    def print_stats(self, worst=10):
+        """Print aggregate counters and the ``worst`` streams by p99 latency"""
+        stats = self.get_stats()
+        total = stats['aggregate']
+        print(f"Streams: {total['streams']}; windows: {total['windows_captured']} captured, "
+              f"{total['windows_processed']} processed, {total['windows_failed']} failed, "
+              f"{total['windows_dropped']} dropped, {total['windows_silent']} silent")
+        if total['mean_batch_size'] is not None:
+            print(f"Batches: {total['batches']} in {total['ticks']} ticks, "
+                  f"mean size {total['mean_batch_size']:.1f}, max {total['max_batch_size']}")
+        if total['realtime_factor']:
+            print(f"Processed {total['audio_seconds']:.1f} s of audio in {self.elapsed:.1f} s "
+                  f"({total['realtime_factor']:.1f}x real time)")
+        if total['p50_latency_ms'] is not None:
+            print(f"Window latency: p50 {total['p50_latency_ms']:.1f} ms, p99 {total['p99_latency_ms']:.1f} ms, "
+                  f"max {total['max_latency_ms']:.1f} ms")
+        
+        ranked = sorted(
+            ((name, s) for name, s in stats['streams'].items() if s['p99_latency_ms'] is not None),
+            key=lambda item: item[1]['p99_latency_ms'], reverse=True
+        )[:worst]
+        for name, s in ranked:
+            print(f"  {name:<30} {s['windows_processed']:6d} windows  p50 {s['p50_latency_ms']:8.1f} ms  "
+                  f"p99 {s['p99_latency_ms']:8.1f} ms  failed {s['windows_failed']}  dropped {s['windows_dropped']}")
+
+def _latency_stats(latencies):
+    """p50/p99/max of a sequence of latencies in seconds, as milliseconds"""
+    if not latencies:
+        return {'p50_latency_ms': None, 'p99_latency_ms': None, 'max_latency_ms': None}
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'p50_latency_ms': float(np.percentile(latencies_ms, 50)),
+        'p99_latency_ms': float(np.percentile(latencies_ms, 99)),
+        'max_latency_ms': float(latencies_ms.max()),
+    }
+
+def _print_result(name, segment):
+    print(f"[{name}] {segment['start']:.1f}s Detected emotion: {segment['emotion']} "
+          f"(confidence: {segment['confidence']:.2f})")
\ No newline at end of file
@@ -0,0 +1,90 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+class PredictionCache:
+    """In-process LRU cache of prediction results keyed on audio content.
+    
+    Keys hash the audio itself (a file's bytes, a PCM buffer or a sample
+    array) together with the model version and whatever else changes the
+    features (sample rate, PCM format, resampler tier, voice activity
+    gate), so a resubmitted clip skips decoding, extraction and inference
+    no matter what it is called. At most ``max_entries`` results are kept,
+    evicting the least recently used. ``set_model_version`` drops every
+    entry when the model changes. Safe to share between threads.
+    """
+    
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.model_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def key_for(self, audio, params=''):
+        """Cache key for an audio input (path, bytes-like PCM or array) under the current model"""
+        hasher = hashlib.blake2b(f"{self.model_version}:{params}".encode(), digest_size=20)
+        if isinstance(audio, (str, os.PathLike)):
+            with open(audio, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    hasher.update(block)
+        elif isinstance(audio, (bytes, bytearray, memoryview)):
+            hasher.update(b'pcm:')
+            hasher.update(audio)
+        else:
+            samples = np.ascontiguousarray(audio)
+            hasher.update(f"array:{samples.dtype.str}:{samples.shape}:".encode())
+            hasher.update(samples.data)
+        return hasher.hexdigest()
+    
+    def get(self, key):
+        """Cached result for a key (marked most recently used), or None"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(result)
+    
+    def put(self, key, result):
+        """Store a result, evicting the least recently used entries beyond ``max_entries``"""
+        with self._lock:
+            self._entries[key] = dict(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def set_model_version(self, version):
+        """Switch to another model; cached results of the previous one are dropped"""
+        with self._lock:
+            if version != self.model_version and self._entries:
+                self._entries.clear()
+                self.invalidations += 1
+            self.model_version = version
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
\ No newline at end of file
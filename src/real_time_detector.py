@@ -1,121 +1,262 @@
-import pyaudio
 import numpy as np
-import librosa
 import threading
+import queue
 import time
+from collections import deque
 from .voice_emotion import VoiceEmotionAnalyzer
+from .ring_buffer import RingBuffer
+from .features import StreamingFeatureExtractor
+from .audio_sources import MicrophoneSource
+from .instrumentation import stage, observe
+
+# What the capture side does when the inference queue is full:
+#   drop_oldest - discard the oldest queued window to make room (lowest latency)
+#   skip        - discard the newly captured window
+#   block       - wait for the inference worker; capture stalls, so only use
+#                 this where losing windows is worse than input overflows
+# Without an explicit policy, live sources (microphone, paced replays) use
+# drop_oldest and unpaced replays use block, so offline runs process every
+# window regardless of machine speed.
+OVERLOAD_POLICIES = ('drop_oldest', 'skip', 'block')
 
 class RealTimeEmotionDetector:
-    def __init__(self, model_path, chunk_size=1024, sample_rate=22050):
-        self.analyzer = VoiceEmotionAnalyzer(model_path)
+    def __init__(self, model_path, chunk_size=1024, sample_rate=22050,
+                 window_seconds=2.0, hop_seconds=1.0, queue_size=4,
+                 overload_policy=None, incremental_features=False, source=None,
+                 backend='auto', vad=None):
+        self.analyzer = VoiceEmotionAnalyzer(model_path, backend=backend)
         self.chunk_size = chunk_size
         self.sample_rate = sample_rate
         self.is_recording = False
-        self.audio_buffer = []
         
-        # Initialize PyAudio
-        self.audio = pyaudio.PyAudio()
+        # Optional incremental extractor that reuses frames shared by overlapping windows
+        self.streaming_extractor = StreamingFeatureExtractor(sr=sample_rate) if incremental_features else None
+        
+        # Analysis window and hop between consecutive windows, in samples; with
+        # incremental features the hop is rounded so frames line up between windows
+        self.window_size = int(sample_rate * window_seconds)
+        self.hop_size = int(sample_rate * hop_seconds)
+        if self.streaming_extractor is not None:
+            self.hop_size = self.streaming_extractor.align_hop(self.hop_size)
+        if not 0 < self.hop_size <= self.window_size:
+            raise ValueError("hop_seconds must be positive and no longer than window_seconds")
+        
+        # Preallocated float32 buffer with room for one window plus a hop and a read
+        self.audio_buffer = RingBuffer(self.window_size + self.hop_size + chunk_size)
+        self.dropped_samples = 0
+        
+        # Absolute stream offset of the oldest buffered sample
+        self.window_start = 0
+        
+        # Optional VoiceActivityGate; windows without speech skip extraction and inference
+        self.vad = vad
+        if vad is not None:
+            vad.reset()
+        
+        # Audio input: the default microphone unless another source is given
+        self.source = source if source is not None else MicrophoneSource(sample_rate, chunk_size)
+        if self.source.sample_rate != sample_rate:
+            raise ValueError(f"Source sample rate {self.source.sample_rate} does not match {sample_rate}")
         
+        # Bounded hand-off between the capture callback and the inference worker
+        if overload_policy is None:
+            overload_policy = 'drop_oldest' if self.source.live else 'block'
+        if overload_policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"overload_policy must be one of {OVERLOAD_POLICIES}")
+        self.overload_policy = overload_policy
+        self.window_queue = queue.Queue(maxsize=queue_size)
+        self.windows_captured = 0
+        self.windows_processed = 0
+        self.windows_dropped = 0
+        self.windows_silent = 0
+        self.samples_received = 0
+        self.elapsed = 0.0
+        
+        # Capture-to-result latency of recent windows, in seconds
+        self.latencies = deque(maxlen=1000)
+    
     def start_recording(self):
-        """Start real-time emotion detection"""
+        """Start real-time emotion detection.
+        
+        The calling thread pulls chunks from the audio source and only
+        buffers them; complete windows are handed to an inference worker
+        thread through a bounded queue, so slow predictions never stall
+        capture. Returns when the source is exhausted or on Ctrl+C.
+        """
         self.is_recording = True
         
-        # Open audio stream
-        stream = self.audio.open(
-            format=pyaudio.paFloat32,
-            channels=1,
-            rate=self.sample_rate,
-            input=True,
-            frames_per_buffer=self.chunk_size
-        )
+        # Warm up librosa's JIT-compiled kernels so the first window is not a latency outlier
+        warmup = 0.1 * np.sin(np.arange(self.window_size, dtype=np.float32) * 0.1)
+        self.analyzer.extract_features(warmup, sr=self.sample_rate)
         
-        print("Starting real-time emotion detection...")
+        worker = threading.Thread(target=self._inference_loop, daemon=True)
+        worker.start()
+        
+        print(f"Starting real-time emotion detection ({type(self.source).__name__})...")
         print("Press Ctrl+C to stop")
         
+        started = time.perf_counter()
+        chunks = self.source.chunks()
         try:
-            while self.is_recording:
-                # Read audio data
-                data = stream.read(self.chunk_size)
-                audio_data = np.frombuffer(data, dtype=np.float32)
-                
-                # Add to buffer
-                self.audio_buffer.extend(audio_data)
-                
-                # Process every 2 seconds of audio
-                if len(self.audio_buffer) >= self.sample_rate * 2:
-                    self.process_audio_chunk()
+            for audio_data in chunks:
+                self.feed(audio_data)
+                if not self.is_recording:
+                    break
                     
         except KeyboardInterrupt:
             print("\nStopping emotion detection...")
             
         finally:
-            stream.stop_stream()
-            stream.close()
+            chunks.close()
             self.is_recording = False
+            
+            # Let the worker drain queued windows, then stop it
+            self.window_queue.put(None)
+            worker.join()
+            self.elapsed = time.perf_counter() - started
+            self.print_stats()
     
-    def process_audio_chunk(self):
-        """Process audio chunk and detect emotion"""
-        if len(self.audio_buffer) < self.sample_rate:
+    def feed(self, audio_data):
+        """Add captured samples and queue every complete window for inference"""
+        self.samples_received += len(audio_data)
+        
+        # Write in slices the ring buffer can always hold after draining
+        step = self.hop_size + self.chunk_size
+        for offset in range(0, len(audio_data), step):
+            self._write_samples(audio_data[offset:offset + step])
+            
+            # Process every full window, advancing by one hop each time
+            while len(self.audio_buffer) >= self.window_size:
+                window = self.audio_buffer.peek(self.window_size)
+                if self._is_speech(window):
+                    # The queue outlives the ring buffer contents, so copy the window once
+                    self._enqueue_window((self.window_start, window.copy(), time.perf_counter()))
+                self._advance()
+    
+    def _write_samples(self, audio_data):
+        """Buffer samples, keeping the stream offset in step with any overflow"""
+        dropped = self.audio_buffer.write(audio_data)
+        self.dropped_samples += dropped
+        self.window_start += dropped
+    
+    def _is_speech(self, window):
+        """Run the voice activity gate, counting windows it rejects"""
+        if self.vad is None:
+            return True
+        with stage('realtime.vad'):
+            speech = self.vad.is_speech(window, self.sample_rate, advance=self.hop_size)
+        if not speech:
+            self.windows_silent += 1
+        return speech
+    
+    def _advance(self):
+        """Slide the analysis window forward by one hop"""
+        self.audio_buffer.consume(self.hop_size)
+        self.window_start += self.hop_size
+    
+    def _enqueue_window(self, window):
+        """Hand a window to the inference worker according to the overload policy"""
+        self.windows_captured += 1
+        
+        if self.overload_policy == 'block':
+            self.window_queue.put(window)
             return
         
-        # Get audio chunk
-        audio_chunk = np.array(self.audio_buffer[:self.sample_rate * 2])
-        self.audio_buffer = self.audio_buffer[self.sample_rate:]
+        try:
+            self.window_queue.put_nowait(window)
+            return
+        except queue.Full:
+            self.windows_dropped += 1
         
-        # Extract features directly from audio data
-        features = self.extract_features_from_audio(audio_chunk)
+        if self.overload_policy == 'drop_oldest':
+            try:
+                self.window_queue.get_nowait()
+            except queue.Empty:
+                pass
+            # Only this thread puts, so there is room now
+            self.window_queue.put_nowait(window)
+    
+    def _inference_loop(self):
+        """Inference worker: analyze queued windows until a None sentinel arrives"""
+        while True:
+            item = self.window_queue.get()
+            if item is None:
+                break
+            start, window, captured_at = item
+            observe('realtime.queue_wait', time.perf_counter() - captured_at)
+            self.analyze_window(window, start)
+            self.latencies.append(time.perf_counter() - captured_at)
+    
+    def analyze_window(self, audio_chunk, start=None):
+        """Detect and report the emotion in one window of audio.
         
-        if features is not None:
-            # Predict emotion
-            features = features.reshape(1, -1)
-            
-            if self.analyzer.scaler:
-                features = self.analyzer.scaler.transform(features)
-            
-            prediction = self.analyzer.model.predict(features)[0]
-            confidence = np.max(self.analyzer.model.predict_proba(features))
-            
-            emotion = self.analyzer.emotions[prediction]
-            
-            print(f"Detected emotion: {emotion} (confidence: {confidence:.2f})")
+        ``start`` is the window's absolute sample offset in the stream; with
+        incremental features enabled it lets frames shared with the previous
+        window be reused.
+        """
+        with stage('realtime.window'):
+            if self.streaming_extractor is not None and start is not None:
+                with stage('features.streaming'):
+                    features = self.streaming_extractor.extract_window(audio_chunk, start)
+                result = self.analyzer.predict_from_features(features)[0]
+            else:
+                # Shared analyzer path: features, scaling and prediction
+                result = self.analyzer.predict_emotion(audio_chunk, sr=self.sample_rate)
+        self.windows_processed += 1
+        
+        if result is not None:
+            print(f"Detected emotion: {result['emotion']} (confidence: {result['confidence']:.2f})")
+        return result
     
-    def extract_features_from_audio(self, audio_data):
-        """Extract features from raw audio data"""
-        try:
-            # Extract features similar to VoiceEmotionAnalyzer
-            features = []
-            
-            # MFCC features
-            mfccs = librosa.feature.mfcc(y=audio_data, sr=self.sample_rate, n_mfcc=13)
-            features.extend([np.mean(mfccs), np.std(mfccs)])
-            
-            # Spectral features
-            spectral_centroids = librosa.feature.spectral_centroid(y=audio_data, sr=self.sample_rate)[0]
-            features.extend([np.mean(spectral_centroids), np.std(spectral_centroids)])
-            
-            # Zero crossing rate
-            zcr = librosa.feature.zero_crossing_rate(audio_data)[0]
-            features.extend([np.mean(zcr), np.std(zcr)])
-            
-            # Chroma features
-            chroma = librosa.feature.chroma_stft(y=audio_data, sr=self.sample_rate)
-            features.extend([np.mean(chroma), np.std(chroma)])
-            
-            # Mel spectrogram
-            mel = librosa.feature.melspectrogram(y=audio_data, sr=self.sample_rate)
-            features.extend([np.mean(mel), np.std(mel)])
-            
-            return np.array(features)
-            
-        except Exception as e:
-            print(f"Error extracting features: {e}")
+    def process_audio_chunk(self):
+        """Synchronously process the next buffered window and detect emotion"""
+        if len(self.audio_buffer) < self.window_size:
             return None
+        
+        # Contiguous view of the window; no copy is made
+        audio_chunk = self.audio_buffer.peek(self.window_size)
+        result = self.analyze_window(audio_chunk, self.window_start) if self._is_speech(audio_chunk) else None
+        self._advance()
+        return result
+    
+    def get_stats(self):
+        """Capture, inference and latency counters"""
+        latencies = np.array(self.latencies) * 1000
+        audio_seconds = self.samples_received / self.sample_rate
+        return {
+            'windows_captured': self.windows_captured,
+            'windows_processed': self.windows_processed,
+            'windows_dropped': self.windows_dropped,
+            'windows_silent': self.windows_silent,
+            'windows_queued': self.window_queue.qsize(),
+            'dropped_samples': self.dropped_samples,
+            'input_overflows': self.source.input_overflows,
+            'audio_seconds': audio_seconds,
+            'realtime_factor': audio_seconds / self.elapsed if self.elapsed else None,
+            'mean_latency_ms': float(latencies.mean()) if len(latencies) else None,
+            'max_latency_ms': float(latencies.max()) if len(latencies) else None,
+        }
+    
+    def print_stats(self):
+        """Print capture and inference counters"""
+        stats = self.get_stats()
+        print(f"Windows: {stats['windows_captured']} captured, {stats['windows_processed']} processed, "
+              f"{stats['windows_dropped']} dropped, {stats['windows_silent']} silent; input overflows: {stats['input_overflows']}")
+        if stats['realtime_factor']:
+            print(f"Processed {stats['audio_seconds']:.1f} s of audio in {self.elapsed:.1f} s "
+                  f"({stats['realtime_factor']:.1f}x real time)")
+        if stats['mean_latency_ms'] is not None:
+            print(f"Window latency: mean {stats['mean_latency_ms']:.1f} ms, max {stats['max_latency_ms']:.1f} ms")
+    
+    def extract_features_from_audio(self, audio_data):
+        """Extract features from raw audio data (array or PCM buffer)"""
+        return self.analyzer.extract_features(audio_data, sr=self.sample_rate)
     
     def stop_recording(self):
         """Stop real-time detection"""
         self.is_recording = False
     
     def __del__(self):
-        """Cleanup PyAudio"""
-        if hasattr(self, 'audio'):
-            self.audio.terminate()
\ No newline at end of file
+        """Release the audio source"""
+        if hasattr(self, 'source'):
+            self.source.close()
\ No newline at end of file
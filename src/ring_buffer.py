@@ -0,0 +1,68 @@
+import numpy as np
+
+class RingBuffer:
+    """Fixed-size sample FIFO backed by a single preallocated numpy array.
+    
+    Every sample is stored twice, at ``i`` and ``i + capacity``, so any run of
+    up to ``capacity`` unread samples is contiguous in memory and ``peek``
+    can hand out a view without copying or boxing samples into Python
+    objects. Views are only valid until the next ``write``.
+    """
+    
+    def __init__(self, capacity, dtype=np.float32):
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self._data = np.zeros(2 * self.capacity, dtype=self.dtype)
+        self._start = 0
+        self._size = 0
+    
+    def __len__(self):
+        return self._size
+    
+    def write(self, samples):
+        """Append samples, overwriting the oldest ones when full; returns how many were dropped"""
+        samples = np.asarray(samples, dtype=self.dtype).ravel()
+        n = len(samples)
+        dropped = 0
+        
+        # Only the newest `capacity` samples can survive
+        if n > self.capacity:
+            dropped += n - self.capacity
+            samples = samples[-self.capacity:]
+            n = self.capacity
+        
+        overflow = self._size + n - self.capacity
+        if overflow > 0:
+            self.consume(overflow)
+            dropped += overflow
+        
+        pos = (self._start + self._size) % self.capacity
+        first = min(n, self.capacity - pos)
+        self._store(pos, samples[:first])
+        if first < n:
+            self._store(0, samples[first:])
+        
+        self._size += n
+        return dropped
+    
+    def _store(self, pos, samples):
+        end = pos + len(samples)
+        self._data[pos:end] = samples
+        self._data[pos + self.capacity:end + self.capacity] = samples
+    
+    def peek(self, n):
+        """Contiguous view of the oldest ``n`` unread samples"""
+        if n > self._size:
+            raise ValueError(f"Requested {n} samples but only {self._size} are buffered")
+        return self._data[self._start:self._start + n]
+    
+    def consume(self, n):
+        """Discard the oldest ``n`` unread samples"""
+        n = min(n, self._size)
+        self._start = (self._start + n) % self.capacity
+        self._size -= n
+    
+    def clear(self):
+        """Discard all buffered samples"""
+        self._start = 0
+        self._size = 0
\ No newline at end of file
@@ -0,0 +1,425 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+from .voice_emotion import VoiceEmotionAnalyzer
+from .prediction_cache import PredictionCache
+from .audio_io import decode_audio, buffer_to_signal, resample
+from . import instrumentation
+
+# Largest request body accepted (about 10 minutes of 16-bit 44.1 kHz stereo)
+MAX_BODY_BYTES = 100 * 1024 * 1024
+
+# Raw PCM sample formats accepted by POST /predict?format=...
+PCM_FORMATS = {'int16': np.int16, 'float32': np.float32}
+
+_STATUS_TEXT = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+}
+
+class HTTPError(Exception):
+    """An error reported to the client with an HTTP status and a JSON message"""
+    
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class MicroBatcher:
+    """Coalesce concurrent predictions into one vectorized call.
+    
+    Requests queue their feature rows; the batching loop takes the first
+    waiting request, then keeps collecting until ``max_batch`` rows are
+    pending or ``max_delay`` seconds have passed, and scores everything with
+    a single ``predict_from_features``. Under light load a request waits at
+    most ``max_delay``; under heavy load batches fill up immediately.
+    """
+    
+    def __init__(self, analyzer, max_batch=32, max_delay=0.005):
+        self.analyzer = analyzer
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.pending = asyncio.Queue()
+        self.pending_rows = 0
+        
+        # Predictions run off the event loop, one batch at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='predict')
+        
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+    
+    async def predict(self, features):
+        """Queue a 2D array of feature rows and wait for their result dicts"""
+        future = asyncio.get_running_loop().create_future()
+        self.pending_rows += len(features)
+        await self.pending.put((features, future))
+        return await future
+    
+    async def run(self):
+        """Batching loop; runs until cancelled"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.pending.get()]
+            rows = len(batch[0][0])
+            deadline = loop.time() + self.max_delay
+            
+            while rows < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.pending.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            
+            self.pending_rows -= rows
+            await self._score(loop, batch, rows)
+    
+    async def _score(self, loop, batch, rows):
+        features = np.vstack([f for f, _ in batch])
+        try:
+            results = await loop.run_in_executor(self._executor, self.analyzer.predict_from_features, features)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        self.batches += 1
+        self.rows += rows
+        self.largest_batch = max(self.largest_batch, rows)
+        
+        offset = 0
+        for f, future in batch:
+            if not future.done():
+                future.set_result(results[offset:offset + len(f)])
+            offset += len(f)
+    
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+class InferenceServer:
+    """Local HTTP inference server that keeps one model warm for many clients.
+    
+    Endpoints (all responses are JSON):
+      GET  /health            model and configuration
+      GET  /metrics           request, batching, queue-depth and latency counters
+                              (plus per-stage timings when instrumentation is on)
+      GET  /metrics/stages    per-stage timings in the Prometheus text format
+      POST /predict           body is an audio file (any libsndfile format), or
+                              raw mono PCM with ?format=int16|float32&sr=RATE
+      POST /predict/features  body is {"features": [[...], ...]}
+    
+    Feature extraction runs on a thread pool; predictions from concurrent
+    requests are coalesced by a ``MicroBatcher``. Connections are kept alive
+    between requests unless the client sends ``Connection: close``.
+    """
+    
+    def __init__(self, model_path, host='127.0.0.1', port=8000, max_batch=32, max_delay_ms=5.0,
+                 workers=None, backend='auto', sample_rate=22050, resample_quality='high', prediction_cache_size=0):
+        # Resubmitted audio (retries, duplicate uploads) is answered from an LRU cache when enabled
+        self.prediction_cache = PredictionCache(prediction_cache_size) if prediction_cache_size else None
+        self.analyzer = VoiceEmotionAnalyzer(model_path, backend=backend, resample_quality=resample_quality,
+                                             prediction_cache=self.prediction_cache)
+        self.model_path = model_path
+        self.host = host
+        self.port = port
+        self.sample_rate = sample_rate
+        self.max_batch = max_batch
+        self.max_delay_ms = max_delay_ms
+        self.workers = workers or os.cpu_count() or 1
+        
+        self.batcher = None
+        self._server = None
+        self._batch_task = None
+        self._extract_pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='extract')
+        
+        self.started = None
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.pending_extractions = 0
+        
+        # End-to-end latency of recent predict requests, in seconds
+        self.latencies = deque(maxlen=1000)
+    
+    async def start(self):
+        """Bind the socket and start the batching loop"""
+        # Warm up librosa's JIT-compiled kernels so the first request is not a latency outlier
+        warmup = 0.1 * np.sin(np.arange(self.sample_rate, dtype=np.float32) * 0.1)
+        self.analyzer.extract_features(warmup, sr=self.sample_rate)
+        
+        self.batcher = MicroBatcher(self.analyzer, self.max_batch, self.max_delay_ms / 1000)
+        self._batch_task = asyncio.create_task(self.batcher.run())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.started = time.perf_counter()
+    
+    async def serve_forever(self):
+        await self.start()
+        print(f"Serving {self.model_path} on http://{self.host}:{self.port} "
+              f"(backend: {self.analyzer.backend}, max batch {self.max_batch}, max delay {self.max_delay_ms} ms)")
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            await self.close()
+    
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            try:
+                await self._batch_task
+            except asyncio.CancelledError:
+                pass
+        if self.batcher is not None:
+            self.batcher.close()
+        self._extract_pool.shutdown(wait=False)
+    
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = None
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, query, headers, body = request
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    status, payload = await self._dispatch(method, path, query, body)
+                except HTTPError as e:
+                    # A request that failed to parse leaves the stream in an unknown state
+                    keep_alive = keep_alive and request is not None
+                    status, payload = e.status, {'error': e.message}
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    # A bug in a handler must not leave the client with an empty reply
+                    keep_alive = keep_alive and request is not None
+                    status, payload = 500, {'error': f"Internal server error: {type(e).__name__}: {e}"}
+                
+                if status >= 400:
+                    self.errors += 1
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _read_request(self, reader):
+        """Parse one HTTP/1.1 request; returns None when the client has closed the connection"""
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        
+        if 'transfer-encoding' in headers:
+            raise HTTPError(400, "Chunked request bodies are not supported; send Content-Length")
+        length = headers.get('content-length', '0')
+        if not (length.isascii() and length.isdigit()):
+            raise HTTPError(400, "Content-Length must be a non-negative integer")
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request body exceeds {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b''
+        
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        return method.upper(), url.path, query, headers, body
+    
+    def _write_response(self, writer, status, payload, keep_alive):
+        # Dicts are sent as JSON, strings (Prometheus text) as plain text
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(payload).encode(), 'application/json'
+        head = (
+            f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+    
+    async def _dispatch(self, method, path, query, body):
+        routes = {
+            '/health': ('GET', self._health),
+            '/metrics': ('GET', self._metrics),
+            '/metrics/stages': ('GET', self._stage_metrics),
+            '/predict': ('POST', self._predict_audio),
+            '/predict/features': ('POST', self._predict_features),
+        }
+        if path not in routes:
+            raise HTTPError(404, f"Unknown endpoint: {path}")
+        expected, handler = routes[path]
+        if method != expected:
+            raise HTTPError(405, f"{path} expects {expected}")
+        
+        self.requests += 1
+        if expected == 'GET':
+            return 200, handler()
+        
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            payload = await handler(query, body)
+        finally:
+            self.in_flight -= 1
+        self.latencies.append(time.perf_counter() - started)
+        return 200, payload
+    
+    def _health(self):
+        return {
+            'status': 'ok',
+            'model': self.model_path,
+            'backend': self.analyzer.backend,
+            'emotions': list(self.analyzer.emotions),
+            'n_features': int(self.analyzer.model.n_features_in_),
+            'sample_rate': self.sample_rate,
+        }
+    
+    def _metrics(self):
+        latencies_ms = np.array(self.latencies) * 1000
+        batcher = self.batcher
+        registry = self._stage_registry()
+        metrics = {
+            'uptime_s': round(time.perf_counter() - self.started, 3),
+            'requests': self.requests,
+            'errors': self.errors,
+            'in_flight': self.in_flight,
+            'queue_depth': {
+                'extraction': self.pending_extractions,
+                'prediction_rows': batcher.pending_rows,
+            },
+            'batching': {
+                'batches': batcher.batches,
+                'rows': batcher.rows,
+                'mean_batch_size': round(batcher.rows / batcher.batches, 2) if batcher.batches else 0.0,
+                'largest_batch': batcher.largest_batch,
+                'max_batch': self.max_batch,
+                'max_delay_ms': self.max_delay_ms,
+            },
+            'latency_ms': {
+                'count': len(latencies_ms),
+                'mean': round(float(latencies_ms.mean()), 3) if len(latencies_ms) else None,
+                'p50': round(float(np.percentile(latencies_ms, 50)), 3) if len(latencies_ms) else None,
+                'p95': round(float(np.percentile(latencies_ms, 95)), 3) if len(latencies_ms) else None,
+                'max': round(float(latencies_ms.max()), 3) if len(latencies_ms) else None,
+            },
+        }
+        if self.prediction_cache is not None:
+            metrics['prediction_cache'] = self.prediction_cache.stats()
+        if registry is not None:
+            metrics['stages'] = registry.snapshot()
+        return metrics
+    
+    def _stage_registry(self):
+        for sink in instrumentation.get_sinks():
+            if isinstance(sink, instrumentation.MetricsRegistry):
+                return sink
+        return None
+    
+    def _stage_metrics(self):
+        registry = self._stage_registry()
+        if registry is None:
+            raise HTTPError(404, "Stage instrumentation is off; start the server with --metrics")
+        return registry.prometheus_text()
+    
+    def _features_from_audio(self, body, pcm_format, sr):
+        """Decode a request body and extract its feature vector (runs on the extraction pool)"""
+        with instrumentation.stage('server.decode'):
+            quality = self.analyzer.resample_quality
+            if pcm_format is None:
+                y, sr = decode_audio(body, sr=self.sample_rate, quality=quality)
+            else:
+                y = resample(buffer_to_signal(body, PCM_FORMATS[pcm_format]), sr, self.sample_rate, quality)
+                sr = self.sample_rate
+        return self.analyzer.extract_features(y, sr=sr)
+    
+    async def _predict_audio(self, query, body):
+        if not body:
+            raise HTTPError(400, "Empty request body; send an audio file or raw PCM")
+        
+        pcm_format = query.get('format')
+        if pcm_format is not None and pcm_format not in PCM_FORMATS:
+            raise HTTPError(400, f"format must be one of {', '.join(PCM_FORMATS)}")
+        try:
+            sr = int(query.get('sr', self.sample_rate))
+        except ValueError:
+            raise HTTPError(400, "sr must be an integer sample rate")
+        
+        cache_key = None
+        if self.prediction_cache is not None:
+            cache_key = self.prediction_cache.key_for(body, f"{pcm_format}:sr={sr}:{self.analyzer.resample_quality}")
+            cached = self.prediction_cache.get(cache_key)
+            if cached is not None:
+                return _result_to_json(cached)
+        
+        loop = asyncio.get_running_loop()
+        self.pending_extractions += 1
+        try:
+            features = await loop.run_in_executor(self._extract_pool, self._features_from_audio, body, pcm_format, sr)
+        except Exception as e:
+            raise HTTPError(400, f"Could not decode audio: {e}")
+        finally:
+            self.pending_extractions -= 1
+        if features is None:
+            raise HTTPError(400, "Could not extract features from audio")
+        
+        result = (await self.batcher.predict(np.atleast_2d(features)))[0]
+        if cache_key is not None:
+            self.prediction_cache.put(cache_key, result)
+        return _result_to_json(result)
+    
+    async def _predict_features(self, query, body):
+        try:
+            features = np.atleast_2d(np.asarray(json.loads(body)['features'], dtype=np.float64))
+        except (ValueError, KeyError, TypeError):
+            raise HTTPError(400, 'Body must be JSON of the form {"features": [[...], ...]}')
+        
+        n_features = self.analyzer.model.n_features_in_
+        if features.ndim != 2 or features.shape[1] != n_features or len(features) == 0:
+            raise HTTPError(400, f"Expected rows of {n_features} features, got shape {list(features.shape)}")
+        
+        results = await self.batcher.predict(features)
+        return {'predictions': [_result_to_json(result) for result in results]}
+
+def _result_to_json(result):
+    return {'emotion': result['emotion'], 'confidence': float(result['confidence'])}
+
+def run_server(model_path, **kwargs):
+    """Run an InferenceServer until interrupted"""
+    server = InferenceServer(model_path, **kwargs)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("\nServer stopped")
\ No newline at end of file
@@ -0,0 +1,100 @@
+import json
+import numpy as np
+from .ring_buffer import RingBuffer
+from .audio_sources import AudioSource, FileSource
+from .features import StreamingFeatureExtractor
+
+# The shortest trailing segment worth classifying: one FFT frame
+MIN_SEGMENT_SAMPLES = 2048
+
+def emotion_timeline(analyzer, audio, sr=22050, window_seconds=2.0, hop_seconds=1.0,
+                     batch_size=32, incremental_features=False, vad=None):
+    """Yield per-segment emotion predictions for a long recording.
+    
+    ``audio`` is a file path or any ``AudioSource``. Audio is read block by
+    block into a fixed-size ring buffer and classified in sliding windows,
+    so memory use stays flat regardless of the recording's length. Windows
+    are classified in batches of ``batch_size`` with one vectorized predict.
+    Each segment is a dict with ``start`` and ``end`` (seconds), ``emotion``
+    and ``confidence``; a trailing partial window is emitted as a shorter
+    final segment. With a ``VoiceActivityGate`` as ``vad``, windows without
+    speech (including leading and trailing silence) are skipped and produce
+    no segment.
+    """
+    source = audio if isinstance(audio, AudioSource) else FileSource(audio, sample_rate=sr, chunk_size=8192)
+    sr = source.sample_rate
+    
+    streaming = StreamingFeatureExtractor(sr=sr) if incremental_features else None
+    
+    window_size = int(sr * window_seconds)
+    hop_size = int(sr * hop_seconds)
+    if streaming is not None:
+        # Frames only line up between windows when the hop is a whole number of frame hops
+        hop_size = streaming.align_hop(hop_size)
+    if not 0 < hop_size <= window_size:
+        raise ValueError("hop_seconds must be positive and no longer than window_seconds")
+    step = hop_size + (source.chunk_size or hop_size)
+    buffer = RingBuffer(window_size + step)
+    window_start = 0
+    windows_emitted = 0
+    
+    pending_features = []
+    pending_spans = []
+    
+    def flush():
+        predictions = analyzer.predict_from_features(np.vstack(pending_features))
+        for (start, end), result in zip(pending_spans, predictions):
+            yield {
+                'start': round(start / sr, 3),
+                'end': round(end / sr, 3),
+                'emotion': result['emotion'],
+                'confidence': float(result['confidence']),
+            }
+        pending_features.clear()
+        pending_spans.clear()
+    
+    if vad is not None:
+        vad.reset()
+    
+    def analyze(samples, start):
+        if vad is not None and not vad.is_speech(samples, sr, advance=hop_size):
+            return
+        if streaming is not None:
+            features = streaming.extract_window(samples, start)
+        else:
+            features = analyzer.extract_features(samples, sr=sr)
+        if features is not None:
+            pending_features.append(features)
+            pending_spans.append((start, start + len(samples)))
+    
+    for audio_data in source.chunks():
+        # Write in slices the ring buffer can always hold after draining
+        for offset in range(0, len(audio_data), step):
+            buffer.write(audio_data[offset:offset + step])
+            
+            while len(buffer) >= window_size:
+                analyze(buffer.peek(window_size), window_start)
+                windows_emitted += 1
+                buffer.consume(hop_size)
+                window_start += hop_size
+                
+                if len(pending_features) >= batch_size:
+                    yield from flush()
+    
+    # Classify audio left over after the last full window
+    remaining = len(buffer)
+    uncovered = windows_emitted == 0 or remaining > window_size - hop_size
+    if uncovered and remaining >= MIN_SEGMENT_SAMPLES:
+        analyze(buffer.peek(remaining), window_start)
+    
+    if pending_features:
+        yield from flush()
+
+def write_jsonl(segments, fp):
+    """Write segments to a text stream as JSON lines, flushing each one"""
+    count = 0
+    for segment in segments:
+        fp.write(json.dumps(segment) + '\n')
+        fp.flush()
+        count += 1
+    return count
\ No newline at end of file
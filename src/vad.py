@@ -0,0 +1,84 @@
+import numpy as np
+
+class VoiceActivityGate:
+    """Energy and zero-crossing-rate voice activity detector.
+    
+    Audio is cut into ``frame_seconds`` frames. A frame is speech when its
+    RMS level is at least ``loud_margin_db`` above ``energy_threshold_db``
+    (dBFS), or when it clears the threshold with a zero-crossing rate of at
+    most ``max_zcr`` crossings per sample: voiced speech crosses zero far
+    less often than hiss or broadband noise of the same level. Speech is
+    extended by ``hangover_seconds`` so word endings and short pauses are
+    kept.
+    
+    ``is_speech`` gates a stream of (possibly overlapping) windows and keeps
+    the hangover running across calls; ``trim`` cuts leading and trailing
+    silence from a whole signal.
+    """
+    
+    def __init__(self, energy_threshold_db=-40.0, max_zcr=0.25, hangover_seconds=0.3, frame_seconds=0.02,
+                 loud_margin_db=10.0):
+        self.energy_threshold_db = energy_threshold_db
+        self.max_zcr = max_zcr
+        self.hangover_seconds = hangover_seconds
+        self.frame_seconds = frame_seconds
+        self.loud_margin_db = loud_margin_db
+        self.reset()
+    
+    def __repr__(self):
+        return (f"VoiceActivityGate(energy_threshold_db={self.energy_threshold_db}, max_zcr={self.max_zcr}, "
+                f"hangover_seconds={self.hangover_seconds}, frame_seconds={self.frame_seconds}, "
+                f"loud_margin_db={self.loud_margin_db})")
+    
+    def reset(self):
+        """Forget the stream state (samples since the last speech frame)"""
+        self._silence = np.inf
+    
+    def speech_frames(self, y, sr):
+        """Boolean speech flag per frame of ``y`` (a trailing partial frame is ignored)"""
+        frame_length = max(1, int(sr * self.frame_seconds))
+        n_frames = len(y) // frame_length
+        frames = np.asarray(y[:n_frames * frame_length], dtype=np.float32).reshape(n_frames, frame_length)
+        
+        energy = np.einsum('ij,ij->i', frames, frames) / frame_length
+        level_db = 10.0 * np.log10(np.maximum(energy, 1e-12))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame_length
+        
+        loud = level_db >= self.energy_threshold_db + self.loud_margin_db
+        voiced = (level_db >= self.energy_threshold_db) & (zcr <= self.max_zcr)
+        return loud | voiced
+    
+    def is_speech(self, y, sr, advance=None):
+        """Whether a window contains speech or falls within the hangover of earlier speech.
+        
+        ``advance`` is how many new samples the window adds to the stream
+        (the hop for overlapping windows; the whole window by default).
+        """
+        frame_length = max(1, int(sr * self.frame_seconds))
+        flags = self.speech_frames(y, sr)
+        
+        if flags.any():
+            last = len(flags) - 1 - int(np.argmax(flags[::-1]))
+            self._silence = len(y) - (last + 1) * frame_length
+        else:
+            self._silence += len(y) if advance is None else advance
+        return self._silence < len(y) + self.hangover_seconds * sr
+    
+    def trim(self, y, sr):
+        """Cut leading and trailing non-speech, keeping ``hangover_seconds`` either side.
+        
+        Signals with no speech frames at all are returned unchanged, so a
+        quiet recording is still analysed rather than dropped.
+        """
+        flags = self.speech_frames(y, sr)
+        if not flags.any():
+            return y
+        
+        frame_length = max(1, int(sr * self.frame_seconds))
+        pad = int(self.hangover_seconds * sr)
+        first = int(np.argmax(flags))
+        last = len(flags) - 1 - int(np.argmax(flags[::-1]))
+        start = max(0, first * frame_length - pad)
+        end = min(len(y), (last + 1) * frame_length + pad)
+        return y[start:end]
\ No newline at end of file
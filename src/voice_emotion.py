@@ -1,93 +1,271 @@
 import numpy as np
-import librosa
+import os
 import pickle
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-import soundfile as sf
+import time
+import uuid
+from .features import FeatureExtractor
+from .audio_io import load_signal, DEFAULT_RESAMPLE_QUALITY
+from .model_format import COMPACT_MODEL_EXTENSION, is_compact_model, save_compact_model, load_model_file
+from .forest_engine import BACKENDS, NativeForest, NativeScaler
+from .model_types import DEFAULT_MODEL_TYPE, MODEL_TYPES, make_model, model_type_of, supports_native
+from .instrumentation import stage
 
 class VoiceEmotionAnalyzer:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, backend='auto', resample_quality=DEFAULT_RESAMPLE_QUALITY, audio_cache=None,
+                 vad=None, prediction_cache=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend: {backend} (expected one of {', '.join(BACKENDS)})")
+        
         self.model = None
         self.scaler = None
         self.emotions = ['neutral', 'happy', 'sad', 'angry', 'fear', 'disgust', 'surprise']
+        self.training_report = None
+        self.backend = backend
+        self._extractors = {}
+        
+        # How audio files are decoded: resampler tier and optional DecodedAudioCache
+        self.resample_quality = resample_quality
+        self.audio_cache = audio_cache
+        
+        # Optional VoiceActivityGate trimming leading and trailing silence before extraction
+        self.vad = vad
+        
+        # Optional PredictionCache for repeated inputs; emptied whenever the model changes
+        self.model_version = None
+        self.prediction_cache = prediction_cache
         
         if model_path:
             self.load_model(model_path)
     
-    def extract_features(self, audio_path, sr=22050):
-        """Extract audio features for emotion recognition"""
+    def _get_extractor(self, sr):
+        """Return the feature extractor for a sample rate, reusing its filter banks"""
+        if sr not in self._extractors:
+            self._extractors[sr] = FeatureExtractor(sr=sr)
+        return self._extractors[sr]
+    
+    def extract_features(self, audio, sr=22050, pcm_dtype=None):
+        """Extract audio features for emotion recognition.
+        
+        ``audio`` may be a file path, a numpy array of samples or a
+        ``bytes``/``memoryview`` PCM buffer (float32 or int16). Files are
+        resampled to ``sr`` (skipped when already at ``sr``); in-memory
+        audio is assumed to be at ``sr``.
+        """
         try:
-            # Load audio file
-            y, sr = librosa.load(audio_path, sr=sr)
-            
-            # Extract features
-            features = []
-            
-            # MFCC features
-            mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-            features.extend([np.mean(mfccs), np.std(mfccs)])
+            # Load or view the audio as a float signal
+            with stage('analyzer.decode'):
+                y, sr = load_signal(audio, sr=sr, pcm_dtype=pcm_dtype,
+                                    quality=self.resample_quality, cache=self.audio_cache)
+            if self.vad is not None:
+                with stage('analyzer.vad'):
+                    y = self.vad.trim(y, sr)
             
-            # Spectral features
-            spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-            features.extend([np.mean(spectral_centroids), np.std(spectral_centroids)])
-            
-            # Zero crossing rate
-            zcr = librosa.feature.zero_crossing_rate(y)[0]
-            features.extend([np.mean(zcr), np.std(zcr)])
-            
-            # Chroma features
-            chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-            features.extend([np.mean(chroma), np.std(chroma)])
-            
-            # Mel spectrogram
-            mel = librosa.feature.melspectrogram(y=y, sr=sr)
-            features.extend([np.mean(mel), np.std(mel)])
-            
-            return np.array(features)
+            # Extract features from a single shared STFT
+            return self._get_extractor(sr).extract(y)
             
         except Exception as e:
             print(f"Error extracting features: {e}")
             return None
     
-    def predict_emotion(self, audio_path):
-        """Predict emotion from audio file"""
+    def extract_features_batch(self, signals, sr=22050):
+        """Feature vectors for equal-length in-memory signals at ``sr``, one call per batch.
+        
+        Returns one vector per signal, like ``extract_features`` would, or
+        None for a signal whose extraction failed. With a voice activity
+        trim the signals no longer share a length and are extracted one by
+        one.
+        """
+        if self.vad is None:
+            try:
+                return list(self._get_extractor(sr).extract_batch(np.stack(signals)))
+            except Exception as e:
+                print(f"Error extracting features for a batch of {len(signals)}: {e}; retrying one at a time")
+        return [self.extract_features(signal, sr=sr) for signal in signals]
+    
+    def predict_emotion(self, audio, sr=22050, pcm_dtype=None):
+        """Predict emotion from an audio file, array or PCM buffer"""
+        return self.predict_emotions([audio], sr=sr, pcm_dtype=pcm_dtype)[0]
+    
+    def predict_emotions(self, audios, sr=22050, pcm_dtype=None):
+        """Predict emotions for a batch of audio inputs.
+        
+        Features are extracted per input, then scaled and classified in a
+        single vectorized pass. Returns one result dict per input, in order,
+        with ``None`` for inputs whose features could not be extracted.
+        With a ``prediction_cache``, inputs seen before under the same model
+        are answered from it without decoding or extraction.
+        """
         if not self.model:
             raise ValueError("Model not loaded. Please train or load a model first.")
         
-        features = self.extract_features(audio_path)
-        if features is None:
-            return None
+        results = [None] * len(audios)
+        keys = [None] * len(audios)
+        pending = list(range(len(audios)))
+        if self.prediction_cache is not None:
+            with stage('analyzer.prediction_cache'):
+                params = f"sr={sr}:{pcm_dtype}:{self.resample_quality}:{self.vad!r}"
+                keys = [_cache_key(self.prediction_cache, audio, params) for audio in audios]
+                results = [self.prediction_cache.get(key) if key else None for key in keys]
+            pending = [i for i, result in enumerate(results) if result is None]
+        
+        features = {i: self.extract_features(audios[i], sr=sr, pcm_dtype=pcm_dtype) for i in pending}
+        valid = [i for i in pending if features[i] is not None]
+        
+        if valid:
+            predictions = self.predict_from_features(np.vstack([features[i] for i in valid]))
+            for i, result in zip(valid, predictions):
+                results[i] = result
+                if keys[i] is not None:
+                    self.prediction_cache.put(keys[i], result)
+        return results
+    
+    def predict_from_features(self, features):
+        """Predict emotions for a 2D array of feature vectors"""
+        if not self.model:
+            raise ValueError("Model not loaded. Please train or load a model first.")
         
-        # Reshape for single prediction
-        features = features.reshape(1, -1)
+        features = np.atleast_2d(features)
         
         # Scale features
         if self.scaler:
-            features = self.scaler.transform(features)
+            with stage('analyzer.scale'):
+                features = self.scaler.transform(features)
         
-        # Predict
-        prediction = self.model.predict(features)[0]
-        confidence = np.max(self.model.predict_proba(features))
+        # One forest pass gives both the label and its confidence
+        with stage('analyzer.model'):
+            probabilities = self.model.predict_proba(features)
+        best = np.argmax(probabilities, axis=1)
+        labels = self.model.classes_[best]
+        confidences = probabilities[np.arange(len(best)), best]
         
-        return {
-            'emotion': self.emotions[prediction],
-            'confidence': confidence
-        }
+        return [
+            {'emotion': self.emotions[label], 'confidence': confidence}
+            for label, confidence in zip(labels, confidences)
+        ]
     
-    def train_model(self, X, y):
-        """Train the emotion recognition model"""
-        # Scale features
+    def train_model(self, X, y, n_jobs=-1, holdout=0.0, n_estimators=100, model_type=DEFAULT_MODEL_TYPE, refit=True):
+        """Train the emotion recognition model.
+        
+        ``model_type`` names an entry of ``model_types.MODEL_TYPES`` (a random
+        forest by default). Forests are fitted in parallel on ``n_jobs``
+        cores (-1 for all). With ``holdout`` > 0 that fraction of the samples
+        is kept out of a first fit (stratified by label) to measure accuracy;
+        with ``refit`` the model is then fitted again on all samples, so the
+        held-out score estimates the kept model without costing it data.
+        Fit time and accuracy are stored in ``self.training_report``.
+        """
+        X_train, X_test, y_train, y_test = _holdout_split(X, y, holdout)
+        n_jobs = n_jobs if MODEL_TYPES[model_type]['parallel_fit'] else None
+        
+        fit_seconds = self._fit_scaled(X_train, y_train, model_type, n_estimators, n_jobs)
+        self.training_report = self._training_report('train', len(y_train), X_test, y_test, fit_seconds)
+        if refit and len(y_test):
+            fit_seconds = self._fit_scaled(X, y, model_type, n_estimators, n_jobs)
+            self.training_report.update(n_train=int(len(y)), fit_seconds=round(fit_seconds, 3), refit=True)
+        
+        self._set_model_version(f"trained:{uuid.uuid4().hex}")
+        return self.model
+    
+    def _fit_scaled(self, X, y, model_type, n_estimators, n_jobs):
+        """Fit a new scaler and model of ``model_type``; returns the fit time in seconds"""
+        # scikit-learn is only needed here and when unpickling a model
+        from sklearn.preprocessing import StandardScaler
+        
         self.scaler = StandardScaler()
         X_scaled = self.scaler.fit_transform(X)
+        self.model = make_model(model_type, n_estimators=n_estimators)
+        return self._fit(X_scaled, y, n_jobs)
+    
+    def add_trees(self, X, y, n_trees=50, n_jobs=-1, holdout=0.0, refit=True):
+        """Grow the loaded forest with ``n_trees`` trees fitted on new data only.
+        
+        Existing trees and the scaler are kept as they are (warm start), so
+        only the new samples need processing. The new data must cover the
+        same emotions as the model. With ``holdout`` > 0, accuracy on the
+        held-out new samples is reported before and after adding trees; with
+        ``refit`` the new trees are then grown again on all new samples.
+        """
+        from sklearn.ensemble import RandomForestClassifier
         
-        # Train model
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.model.fit(X_scaled, y)
+        if not isinstance(self.model, RandomForestClassifier):
+            raise ValueError("Adding trees needs a pickled scikit-learn forest loaded with backend='sklearn'")
         
+        labels = set(np.unique(y).tolist())
+        classes = set(self.model.classes_.tolist())
+        if labels != classes:
+            # Trees fitted on a different label set would produce misaligned probabilities
+            missing = ', '.join(self.emotions[c] for c in sorted(classes - labels)) or 'none'
+            unknown = ', '.join(str(c) for c in sorted(labels - classes)) or 'none'
+            raise ValueError(f"New data must cover the model's emotions exactly (missing: {missing}; unknown labels: {unknown})")
+        
+        X_train, X_test, y_train, y_test = _holdout_split(X, y, holdout)
+        accuracy_before = self._accuracy(X_test, y_test)
+        
+        base_estimators = list(self.model.estimators_)
+        fit_seconds = self._grow(X_train, y_train, n_trees, n_jobs)
+        self.training_report = self._training_report('add_trees', len(y_train), X_test, y_test, fit_seconds)
+        self.training_report['holdout_accuracy_before'] = accuracy_before
+        if refit and len(y_test):
+            # Drop the trees grown for scoring and grow them again on every new sample
+            self.model.estimators_ = list(base_estimators)
+            fit_seconds = self._grow(X, y, n_trees, n_jobs)
+            self.training_report.update(n_train=int(len(y)), fit_seconds=round(fit_seconds, 3), refit=True)
+        
+        self._set_model_version(f"trained:{uuid.uuid4().hex}")
         return self.model
     
+    def _grow(self, X, y, n_trees, n_jobs):
+        """Warm-start ``n_trees`` more trees of the loaded forest on unscaled samples"""
+        if self.scaler:
+            X = self.scaler.transform(X)
+        self.model.set_params(warm_start=True, n_estimators=len(self.model.estimators_) + n_trees)
+        try:
+            return self._fit(X, y, n_jobs)
+        finally:
+            self.model.set_params(warm_start=False)
+    
+    def _fit(self, X, y, n_jobs):
+        """Fit the model (on n_jobs cores unless None) and return the fit time in seconds"""
+        if n_jobs is not None:
+            self.model.set_params(n_jobs=n_jobs)
+        started = time.perf_counter()
+        self.model.fit(X, y)
+        fit_seconds = time.perf_counter() - started
+        
+        # Predict single-threaded: a thread pool per call costs more than it saves on small batches
+        if n_jobs is not None:
+            self.model.set_params(n_jobs=None)
+        return fit_seconds
+    
+    def _accuracy(self, X, y):
+        """Accuracy on unscaled features, or None without samples"""
+        if len(y) == 0:
+            return None
+        predictions = [result['emotion'] for result in self.predict_from_features(X)]
+        return float(np.mean(np.array(predictions) == np.array([self.emotions[label] for label in y])))
+    
+    def _training_report(self, mode, n_train, X_test, y_test, fit_seconds):
+        return {
+            'mode': mode,
+            'model_type': model_type_of(self.model),
+            'n_train': int(n_train),
+            'n_holdout': int(len(y_test)),
+            'n_trees': len(self.model.estimators_) if hasattr(self.model, 'estimators_') else None,
+            'fit_seconds': round(fit_seconds, 3),
+            'holdout_accuracy': self._accuracy(X_test, y_test),
+            'refit': False,
+        }
+    
     def save_model(self, model_path):
-        """Save trained model and scaler"""
+        """Save trained model and scaler.
+        
+        Paths ending in ``.vem`` use the compact memory-mappable format
+        (forests only); anything else is pickled.
+        """
+        if model_path.endswith(COMPACT_MODEL_EXTENSION):
+            save_compact_model(model_path, self.model, self.scaler, self.emotions)
+            return
+        
         model_data = {
             'model': self.model,
             'scaler': self.scaler,
@@ -98,10 +276,71 @@ class VoiceEmotionAnalyzer:
             pickle.dump(model_data, f)
     
     def load_model(self, model_path):
-        """Load trained model and scaler"""
+        """Load trained model and scaler (pickle or compact format).
+        
+        Compact models always run on the native engine. Pickled forests run
+        on scikit-learn unless the analyzer was created with
+        ``backend='native'``, in which case they are flattened on load.
+        """
+        if is_compact_model(model_path):
+            if self.backend == 'sklearn':
+                raise ValueError("Compact (.vem) models only support the native backend")
+            self.model, self.scaler, self.emotions = load_model_file(model_path)
+            self.backend = 'native'
+            self._set_model_version(_file_version(model_path))
+            return
+        
         with open(model_path, 'rb') as f:
             model_data = pickle.load(f)
         
         self.model = model_data['model']
         self.scaler = model_data['scaler']
-        self.emotions = model_data['emotions']
\ No newline at end of file
+        self.emotions = model_data['emotions']
+        
+        if self.backend == 'native':
+            self.use_native_backend()
+        self._set_model_version(_file_version(model_path))
+    
+    def _set_model_version(self, version):
+        """Record which model is loaded, invalidating cached predictions of the previous one"""
+        self.model_version = version
+        if self.prediction_cache is not None:
+            self.prediction_cache.set_model_version(version)
+    
+    def use_native_backend(self):
+        """Switch a fitted scikit-learn forest and scaler to the native engine"""
+        if not isinstance(self.model, NativeForest):
+            if not supports_native(self.model):
+                raise ValueError(f"The native backend only runs forests, not {model_type_of(self.model)}")
+            n_features = self.model.n_features_in_
+            if self.scaler is not None:
+                self.scaler = NativeScaler.from_sklearn(self.scaler, n_features)
+            self.model = NativeForest.from_sklearn(self.model)
+        self.backend = 'native'
+
+def _cache_key(cache, audio, params):
+    """Prediction cache key for an input, or None if it cannot be read (extraction reports the error)"""
+    try:
+        return cache.key_for(audio, params)
+    except OSError:
+        return None
+
+def _file_version(path):
+    """Model version of a saved model: its path, size and modification time"""
+    stat = os.stat(path)
+    return f"file:{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+def _holdout_split(X, y, holdout):
+    """Split off a stratified held-out fraction; returns X_train, X_test, y_train, y_test"""
+    X, y = np.asarray(X), np.asarray(y)
+    if not holdout:
+        return X, X[:0], y, y[:0]
+    
+    from sklearn.model_selection import train_test_split
+    
+    # Stratify when every label has at least two samples to split between the
+    # sides and the held-out side is big enough to contain each label once
+    _, counts = np.unique(y, return_counts=True)
+    n_test = int(np.ceil(holdout * len(y)))
+    stratify = y if counts.min() >= 2 and n_test >= len(counts) else None
+    return train_test_split(X, y, test_size=holdout, random_state=42, stratify=stratify)
\ No newline at end of file